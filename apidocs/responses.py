@@ -1,4 +1,6 @@
+from filters import ALLOWED_SORTS
 from models.task import ALLOWED_STATE_FILTER, ALLOWED_STATES
+from serialization import TASK_FIELDS
 
 
 create_user = {
@@ -20,6 +22,15 @@ create_user = {
               }
           }
           },
+    429: {"description": "Servidor ocupado gerando/verificando senhas.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "detail": "Servidor ocupado, tente novamente."
+                  }
+              }
+          }
+          },
 }
 
 
@@ -43,6 +54,15 @@ login_user = {
               }
           }
           },
+    429: {"description": "Servidor ocupado gerando/verificando senhas.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "detail": "Servidor ocupado, tente novamente."
+                  }
+              }
+          }
+          },
 }
 
 read_task = {
@@ -60,6 +80,7 @@ read_task = {
               }
           }
           },
+    304: {"description": "Não modificado, o ETag enviado em If-None-Match (ou a data em If-Modified-Since) ainda é o atual, a resposta não tem corpo."},
     404: {"description": "Tarefa não encontrada!",
           "content": {
               "application/json": {
@@ -122,12 +143,26 @@ list_tasks = {
               }
           }
           },
-    400: {"description": "Valor de estado incorreto.",
+    304: {"description": "Não modificado, o ETag enviado em If-None-Match ainda é o atual, a resposta não tem corpo."},
+    400: {"description": "Filtros, ordenação ou campos incorretos.",
           "content": {
               "application/json": {
                   "example": {
-                      "detail": f"Possiveis filtros de estado: {
-                          ALLOWED_STATE_FILTER}"
+                      "filtro_invalido": {
+                          "detail": f"Possiveis filtros de estado: {ALLOWED_STATE_FILTER}"
+                      },
+                      "ordenacao_invalida": {
+                          "detail": f"Possiveis ordenações: {ALLOWED_SORTS}"
+                      },
+                      "datas_invalidas": {
+                          "detail": "Intervalo de datas invalido."
+                      },
+                      "consulta_sem_indice": {
+                          "detail": "Combinação de filtros e ordenação não suportada para esta quantidade de tarefas, combine o filtro de datas somente com a ordenação pela mesma data e o filtro de um unico estado somente com a ordenação por id."
+                      },
+                      "campos_invalidos": {
+                          "detail": f"Campos invalidos: ['prioridade'], possiveis campos: {TASK_FIELDS}"
+                      }
                   }
               }
           }
@@ -153,6 +188,81 @@ list_tasks = {
 }
 
 
+list_tasks_cursor = {
+    200: {"description": "Pagina de tarefas acessada com sucesso!",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "tarefas": [
+                          {
+                              "id": 1,
+                              "titulo": "Ir ao mercado",
+                              "descricao": "comprar ovos, pães e café",
+                              "estado": "pendente",
+                              "data_criacao": "data aleatoría",
+                              "data_atualizacao": "data aleatória"
+                          },
+                          {
+                              "id": 2,
+                              "titulo": "Arrumar a casa",
+                              "descricao": "limpar o banheiro, cozinha...",
+                              "estado": "pendente",
+                              "data_criacao": "data aleatoría",
+                              "data_atualizacao": "data aleatória"
+                          },
+                      ],
+                      "proximo_cursor": "eyJpZCI6Mn0"
+                  }
+              }
+          }
+          },
+    304: {"description": "Não modificado, o ETag enviado em If-None-Match ainda é o atual, a resposta não tem corpo."},
+    400: {"description": "Filtros, ordenação, cursor ou campos incorretos.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "filtro_invalido": {
+                          "detail": f"Possiveis filtros de estado: {ALLOWED_STATE_FILTER}"
+                      },
+                      "ordenacao_invalida": {
+                          "detail": f"Possiveis ordenações: {ALLOWED_SORTS}"
+                      },
+                      "datas_invalidas": {
+                          "detail": "Intervalo de datas invalido."
+                      },
+                      "consulta_sem_indice": {
+                          "detail": "Combinação de filtros e ordenação não suportada para esta quantidade de tarefas, combine o filtro de datas somente com a ordenação pela mesma data e o filtro de um unico estado somente com a ordenação por id."
+                      },
+                      "cursor_invalido": {
+                          "detail": "Cursor invalido."
+                      },
+                      "campos_invalidos": {
+                          "detail": f"Campos invalidos: ['prioridade'], possiveis campos: {TASK_FIELDS}"
+                      }
+                  }
+              }
+          }
+          },
+    401: {"description": "Acesso negado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "nao_autenticado": {"detail": "Not authenticated"},
+                      "token_invalido":  {
+                          "detail": "Token invalido"
+                      },
+                      "token_expirado":  {
+                          "detail": "Token expirado"
+                      },
+                      "acesso_negado": {
+                          "detail": "Acesso negado."
+                      }
+                  },
+              }
+          }
+          },
+}
+
 update_tasks = {
     200: {"description": "Tarefa atualizada com sucesso!",
           "content": {
@@ -293,6 +403,334 @@ delete_tasks = {
 }
 
 
+bulk_tasks = {
+    200: {"description": "Lote processado, tarefas invalidas são retornadas em \"erros\".",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "tarefas": [
+                          {
+                              "id": 1,
+                              "titulo": "Ir ao mercado",
+                              "descricao": "comprar ovos, pães e café",
+                              "estado": "pendente",
+                              "data_criacao": "data aleatoría",
+                              "data_atualizacao": "data aleatória"
+                          },
+                      ],
+                      "erros": [
+                          {
+                              "indice": 1,
+                              "detail": {"estado": f'Somente 3 valores possiveis: {ALLOWED_STATES}'}
+                          },
+                      ]
+                  }
+              }
+          }
+          },
+    400: {"description": "Lista vazia ou com tarefas demais.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "detail": "Maximo de 1000 tarefas por requisição."
+                  }
+              }
+          }
+          },
+    401: {"description": "Acesso negado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "nao_autenticado": {"detail": "Not authenticated"},
+                      "token_invalido":  {
+                          "detail": "Token invalido"
+                      },
+                      "token_expirado":  {
+                          "detail": "Token expirado"
+                      },
+                      "acesso_negado": {
+                          "detail": "Acesso negado."
+                      }
+                  },
+              }
+          }
+          },
+}
+
+
+bulk_delete_tasks = {
+    200: {"description": "Tarefas excluídas, as que não existem são retornadas em \"erros\".",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "ids": [1, 2],
+                      "erros": [
+                          {
+                              "indice": 2,
+                              "detail": "Tarefa não encontrada."
+                          },
+                      ]
+                  }
+              }
+          }
+          },
+    400: {"description": "Lista vazia ou com tarefas demais.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "detail": "Maximo de 1000 tarefas por requisição."
+                  }
+              }
+          }
+          },
+    401: {"description": "Acesso negado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "nao_autenticado": {"detail": "Not authenticated"},
+                      "token_invalido":  {
+                          "detail": "Token invalido"
+                      },
+                      "token_expirado":  {
+                          "detail": "Token expirado"
+                      },
+                      "acesso_negado": {
+                          "detail": "Acesso negado."
+                      }
+                  },
+              }
+          }
+          },
+}
+
+export_tasks = {
+    200: {"description": "Tarefas exportadas com sucesso!",
+          "content": {
+              "application/x-ndjson": {
+                  "example": '{"id": 1, "titulo": "Ir ao mercado", "descricao": "comprar ovos, pães e café", "estado": "pendente", "data_criacao": "data aleatoría", "data_atualizacao": "data aleatória"}\n'
+              },
+              "text/csv": {
+                  "example": "id,titulo,descricao,estado,data_criacao,data_atualizacao\r\n1,Ir ao mercado,\"comprar ovos, pães e café\",pendente,data aleatoría,data aleatória\r\n"
+              }
+          }
+          },
+    400: {"description": "Filtros ou ordenação incorretos.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "filtro_invalido": {
+                          "detail": f"Possiveis filtros de estado: {ALLOWED_STATE_FILTER}"
+                      },
+                      "ordenacao_invalida": {
+                          "detail": f"Possiveis ordenações: {ALLOWED_SORTS}"
+                      },
+                  }
+              }
+          }
+          },
+    401: {"description": "Acesso negado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "nao_autenticado": {"detail": "Not authenticated"},
+                      "token_invalido":  {
+                          "detail": "Token invalido"
+                      },
+                      "token_expirado":  {
+                          "detail": "Token expirado"
+                      },
+                      "acesso_negado": {
+                          "detail": "Acesso negado."
+                      }
+                  },
+              }
+          }
+          },
+}
+
+import_tasks = {
+    200: {"description": "Arquivo importado, registros invalidos são retornados em \"erros\".",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "aceitas": 2,
+                      "rejeitadas": 1,
+                      "erros": [
+                          {
+                              "registro": 3,
+                              "detail": {
+                                  "titulo": "Campo obrigatório",
+                                  "descricao": "Campo opcional",
+                                  "estado": f'Somente 3 valores possiveis: {ALLOWED_STATES}'
+                              }
+                          },
+                      ]
+                  }
+              }
+          }
+          },
+    401: {"description": "Acesso negado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "nao_autenticado": {"detail": "Not authenticated"},
+                      "token_invalido":  {
+                          "detail": "Token invalido"
+                      },
+                      "token_expirado":  {
+                          "detail": "Token expirado"
+                      },
+                      "acesso_negado": {
+                          "detail": "Acesso negado."
+                      }
+                  },
+              }
+          }
+          },
+}
+
+database_pool = {
+    200: {"description": "Estado e metricas dos pools de conexão de cada banco configurado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "primario": {
+                          "pool": "QueuePool",
+                          "tamanho": 5,
+                          "max_overflow": 10,
+                          "em_uso": 1,
+                          "livres": 4,
+                          "overflow": 0,
+                          "checkouts": 120,
+                          "espera_media_ms": 0.041,
+                          "espera_maxima_ms": 2.315,
+                          "eventos_overflow": 0,
+                          "timeouts": 0
+                      }
+                  }
+              }
+          }
+          },
+    401: {"description": "Acesso negado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "nao_autenticado": {"detail": "Not authenticated"},
+                      "token_invalido":  {
+                          "detail": "Token invalido"
+                      },
+                      "token_expirado":  {
+                          "detail": "Token expirado"
+                      },
+                      "acesso_negado": {
+                          "detail": "Acesso negado."
+                      }
+                  },
+              }
+          }
+          },
+}
+
+metrics = {
+    200: {"description": "Metricas no formato texto do Prometheus.",
+          "content": {
+              "text/plain": {
+                  "example": "# HELP http_requests_total Requisições por rota, metodo e status.\n"
+                  "# TYPE http_requests_total counter\n"
+                  "http_requests_total{method=\"GET\",route=\"/api/tasks/{id}\",status=\"200\"} 42\n"
+              }
+          }
+          },
+}
+
+summary_tasks = {
+    200: {"description": "Total de tarefas e quantidade por estado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "total": 3,
+                      "estados": {
+                          "pendente": 1,
+                          "concluída": 1,
+                          "em andamento": 1
+                      }
+                  }
+              }
+          }
+          },
+    304: {"description": "Não modificado, o ETag enviado em If-None-Match ainda é o atual, a resposta não tem corpo."},
+    401: {"description": "Acesso negado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "nao_autenticado": {"detail": "Not authenticated"},
+                      "token_invalido":  {
+                          "detail": "Token invalido"
+                      },
+                      "token_expirado":  {
+                          "detail": "Token expirado"
+                      },
+                      "acesso_negado": {
+                          "detail": "Acesso negado."
+                      }
+                  },
+              }
+          }
+          },
+}
+
+search_tasks = {
+    200: {"description": "Tarefas encontradas, ordenadas pela relevancia.",
+          "content": {
+              "application/json": {
+                  "example": [
+                      {
+                          "id": 1,
+                          "titulo": "Ir ao mercado",
+                          "descricao": "comprar ovos, pães e café",
+                          "estado": "pendente",
+                          "data_criacao": "data aleatoría",
+                          "data_atualizacao": "data aleatória"
+                      },
+                  ]
+              }
+          }
+          },
+    304: {"description": "Não modificado, o ETag enviado em If-None-Match ainda é o atual, a resposta não tem corpo."},
+    400: {"description": "Termo de busca ou campos incorretos.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "termo_invalido": {
+                          "detail": "Informe pelo menos uma palavra para a busca."
+                      },
+                      "campos_invalidos": {
+                          "detail": f"Campos invalidos: ['prioridade'], possiveis campos: {TASK_FIELDS}"
+                      }
+                  }
+              }
+          }
+          },
+    401: {"description": "Acesso negado.",
+          "content": {
+              "application/json": {
+                  "example": {
+                      "nao_autenticado": {"detail": "Not authenticated"},
+                      "token_invalido":  {
+                          "detail": "Token invalido"
+                      },
+                      "token_expirado":  {
+                          "detail": "Token expirado"
+                      },
+                      "acesso_negado": {
+                          "detail": "Acesso negado."
+                      }
+                  },
+              }
+          }
+          },
+}
+
 {
     "token_invalido":  {
         "detail": "Token invalido"
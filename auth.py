@@ -0,0 +1,37 @@
+from fastapi import Depends, HTTPException
+from sqlmodel import Session
+from typing import Annotated
+from cache import user_cache
+from database import DatabaseSessionDep, oauth_scheme, run_in_session
+from metrics import span
+from models.user import User, UserSerializer
+from utils import decode_user
+
+
+def load_user(session: Session, user_id: int):
+    user = session.get(User, user_id)
+    return UserSerializer.model_validate(user) if user else None
+
+
+async def get_current_user(session: DatabaseSessionDep, token: Annotated[str, Depends(oauth_scheme)]) -> UserSerializer:
+    """
+        Dependencia dos endpoints protegidos: valida o token e resolve o usuário pelo "sub" (id),
+        usando o cache de usuários para não consultar o banco a cada requisição.
+
+        O usuário é lido do primario (e não de uma replica), para que um usuário recém criado
+        já consiga usar o token mesmo com atraso de replicação.
+    """
+    with span("auth"):
+        claims = decode_user(token)
+        try:
+            user_id = int(claims["sub"])
+        except (KeyError, TypeError, ValueError):
+            raise HTTPException(status_code=401, detail="Token invalido")
+
+        user = user_cache.get(user_id)
+        if user is None:
+            user = await run_in_session(session, load_user, user_id)
+            if user is None:
+                raise HTTPException(status_code=401, detail="Acesso negado.")
+            user_cache.set(user_id, user)
+        return user
@@ -0,0 +1,312 @@
+from argparse import ArgumentParser
+from datetime import datetime
+from database import create_database_engine, create_db_and_tables
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from generate_tasks import seed_tasks
+from hashing import generate_hashed_pwd
+import crud
+from models.task import Task
+from pathlib import Path
+from search import SEARCH_MAX_CANDIDATES
+from secrets import token_hex
+from serialization import TASK_COLUMNS, dump_tasks
+from settings import PAGINATION_MAX_PER_PAGE, PAGINATION_PER_PAGE
+from sqlmodel import Session, select
+from utils import encode_cursor
+import asyncio
+import httpx
+import json
+import os
+import random
+import string
+import subprocess
+import sys
+import time
+
+# Benchmark de latencia e vazão da API: popula um banco do tamanho escolhido, sobe a aplicação
+# com uvicorn em outro processo e dispara requisições concorrentes em cada endpoint.
+
+BENCHMARK_USER = {"username": "benchmark", "password": "benchmark"}
+
+
+def get_benchmark_user_id(database_url: str):
+    # O usuário é criado direto no banco antes de popular, pois as tarefas pertencem a ele.
+    database_engine = create_database_engine(database_url)
+    create_db_and_tables(database_engine)
+    with Session(database_engine) as session:
+        user = crud.get_user_by_username(session, BENCHMARK_USER["username"]) or crud.create_user(
+            session, BENCHMARK_USER["username"], generate_hashed_pwd(BENCHMARK_USER["password"]))
+        user_id = user.id
+    database_engine.dispose()
+    return user_id
+
+
+def percentile(sorted_values: list[float], percent: float):
+    if not sorted_values:
+        return None
+    index = max(int(round(percent / 100 * len(sorted_values))) - 1, 0)
+    return sorted_values[min(index, len(sorted_values) - 1)]
+
+
+def summarize(latencies: list[float], statuses: dict[int, int], elapsed: float):
+    values = sorted(latencies)
+    errors = sum(count for status, count in statuses.items() if status >= 400)
+    return {
+        "requisicoes": len(values),
+        "erros": errors,
+        "status": {str(status): count for status, count in sorted(statuses.items())},
+        "vazao_rps": round(len(values) / elapsed, 2) if elapsed else None,
+        "media_ms": round(sum(values) / len(values) * 1000, 3) if values else None,
+        "p50_ms": round(percentile(values, 50) * 1000, 3) if values else None,
+        "p95_ms": round(percentile(values, 95) * 1000, 3) if values else None,
+        "p99_ms": round(percentile(values, 99) * 1000, 3) if values else None,
+        "max_ms": round(values[-1] * 1000, 3) if values else None,
+    }
+
+
+async def run_scenario(client: httpx.AsyncClient, build_request, total: int, concurrency: int, on_response=None):
+    latencies, statuses = [], {}
+    counter = iter(range(total))
+
+    async def worker():
+        for number in counter:
+            method, url, kwargs = build_request(number)
+            started_at = time.perf_counter()
+            response = await client.request(method, url, **kwargs)
+            latencies.append(time.perf_counter() - started_at)
+            statuses[response.status_code] = statuses.get(
+                response.status_code, 0) + 1
+            if on_response:
+                on_response(response)
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return summarize(latencies, statuses, time.perf_counter() - started_at)
+
+
+def build_scenarios(token: str, total_tasks: int, per_page: int, rng: random.Random):
+    auth = {"Authorization": f"Bearer {token}"}
+    last_page = max(total_tasks // per_page, 1)
+    created_ids = []
+
+    def login(number):
+        return "POST", "/api/auth/token", {"data": BENCHMARK_USER}
+
+    def list_page(number):
+        return "GET", f"/api/tasks/list/{rng.randint(1, last_page)}", {"headers": auth}
+
+    def list_page_with_state(number):
+        estado = rng.choice(("pendente", "andamento", "concluida"))
+        return "GET", f"/api/tasks/list/{rng.randint(1, max(last_page // 3, 1))}", {"headers": auth, "params": {"estado": estado}}
+
+    def list_cursor(number):
+        cursor = {"cursor": encode_cursor({"id": rng.randint(0, total_tasks)})}
+        return "GET", "/api/tasks/list", {"headers": auth, "params": cursor}
+
+    def search_frequent_term(number):
+        # Uma unica letra combina com boa parte das tarefas geradas, o pior caso do ranking.
+        params = {"termo": rng.choice(string.ascii_lowercase),
+                  "pagina": rng.randint(1, max(SEARCH_MAX_CANDIDATES // per_page, 1))}
+        return "GET", "/api/tasks/search", {"headers": auth, "params": params}
+
+    def read(number):
+        return "GET", f"/api/tasks/{rng.randint(1, total_tasks)}", {"headers": auth}
+
+    def patch(number):
+        return "PATCH", f"/api/tasks/{rng.randint(1, total_tasks)}", {"headers": auth, "json": {"titulo": f"Benchmark {number}"}}
+
+    def create(number):
+        return "POST", "/api/tasks", {"headers": auth, "json": {"titulo": f"Benchmark {number}", "descricao": "criada pelo benchmark", "estado": "pendente"}}
+
+    def delete(number):
+        return "DELETE", f"/api/tasks/{created_ids[number]}", {"headers": auth}
+
+    return created_ids, {
+        "login": login,
+        "listar_pagina": list_page,
+        "listar_pagina_estado": list_page_with_state,
+        "listar_cursor": list_cursor,
+        "buscar_termo_frequente": search_frequent_term,
+        "ler": read,
+        "atualizar": patch,
+        "criar": create,
+        "excluir": delete,
+    }
+
+
+def benchmark_serialization(database_url: str, per_page: int, repetitions: int):
+    """
+        Mede consulta + serialização de uma pagina de tarefas sem o servidor HTTP: instancias do
+        ORM passando pelo jsonable_encoder (caminho anterior) contra tuplas de colunas com orjson.
+    """
+    database_engine = create_database_engine(database_url)
+
+    def orm_page(session: Session, offset: int):
+        tasks = session.exec(select(Task).order_by(
+            Task.id).offset(offset).limit(per_page)).all()
+        return JSONResponse(jsonable_encoder(tasks)).body
+
+    def row_page(session: Session, offset: int):
+        rows = session.exec(select(*TASK_COLUMNS).order_by(
+            Task.id).offset(offset).limit(per_page)).all()
+        return dump_tasks(rows)
+
+    results = {}
+    for name, build_page in (("orm_jsonable_encoder", orm_page), ("tuplas_orjson", row_page)):
+        latencies = []
+        for number in range(repetitions):
+            # Uma sessão nova por pagina, para o identity map não reaproveitar instancias.
+            with Session(database_engine) as session:
+                started_at = time.perf_counter()
+                build_page(session, number * per_page)
+                latencies.append(time.perf_counter() - started_at)
+        results[name] = summarize(latencies, {200: repetitions}, sum(latencies))
+        print(f"{name:>22}: {results[name]['vazao_rps']:>9} paginas/s  p50 {results[name]['p50_ms']:>8} ms  "
+              f"p95 {results[name]['p95_ms']:>8} ms  ({per_page} tarefas por pagina)")
+
+    database_engine.dispose()
+    speedup = results["orm_jsonable_encoder"]["media_ms"] / \
+        results["tuplas_orjson"]["media_ms"]
+    print(f"{'ganho':>22}: {speedup:.2f}x")
+    return results
+
+
+def wait_until_ready(base_url: str, server: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError("O servidor encerrou antes de ficar pronto.")
+        try:
+            if httpx.get(f"{base_url}/openapi.json").status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError("O servidor não ficou pronto a tempo.")
+
+
+async def run_benchmark(base_url: str, total_tasks: int, requests: int, concurrency: int, per_page: int, seed: int):
+    rng = random.Random(seed)
+    limits = httpx.Limits(max_connections=concurrency,
+                          max_keepalive_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        token = (await client.post("/api/auth/token", data=BENCHMARK_USER)).json()["access_token"]
+
+        created_ids, scenarios = build_scenarios(
+            token, total_tasks, per_page, rng)
+
+        def save_created_id(response: httpx.Response):
+            if response.status_code == 200:
+                created_ids.append(response.json()["id"])
+
+        results = {}
+        for name, build_request in scenarios.items():
+            # O bcrypt deixa o login ordens de grandeza mais lento, então ele recebe menos requisições.
+            total = max(requests // 10, 1) if name == "login" else requests
+            if name == "excluir":
+                # Exclui somente as tarefas criadas pelo cenario anterior, cada uma uma unica vez.
+                total = len(created_ids)
+                if not total:
+                    continue
+            on_response = save_created_id if name == "criar" else None
+            results[name] = await run_scenario(client, build_request, total, concurrency, on_response)
+            print(f"{name:>22}: {results[name]['vazao_rps']:>9} req/s  p50 {results[name]['p50_ms']:>8} ms  "
+                  f"p95 {results[name]['p95_ms']:>8} ms  p99 {results[name]['p99_ms']:>8} ms  erros {results[name]['erros']}")
+        return results
+
+
+def compare(results: dict, previous_path: Path):
+    previous = json.loads(previous_path.read_text())["cenarios"]
+    print(f"\nComparação com {previous_path}:")
+    for name, stats in results.items():
+        if name not in previous:
+            continue
+        old = previous[name]
+        p95_change = (stats["p95_ms"] - old["p95_ms"]) / old["p95_ms"] * 100
+        rps_change = (stats["vazao_rps"] - old["vazao_rps"]) / \
+            old["vazao_rps"] * 100
+        print(f"{name:>22}: p95 {p95_change:+7.1f}%  vazão {rps_change:+7.1f}%")
+
+
+def get_git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Mede latencia (p50/p95/p99) e vazão de cada endpoint da API contra um processo uvicorn real.")
+    parser.add_argument("--quantidade", type=int, default=10000,
+                        help="Quantidade de tarefas no banco do benchmark (padrão: 10000).")
+    parser.add_argument("--requisicoes", type=int, default=1000,
+                        help="Requisições por cenario, o login usa um decimo (padrão: 1000).")
+    parser.add_argument("--concorrencia", type=int, default=16,
+                        help="Requisições simultaneas (padrão: 16).")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Workers do uvicorn (padrão: 1).")
+    parser.add_argument("--porta", type=int, default=8765)
+    parser.add_argument("--database-url", default="sqlite:///benchmark.db",
+                        help="Banco usado pelo benchmark (padrão: sqlite:///benchmark.db).")
+    parser.add_argument("--reusar-banco", action="store_true",
+                        help="Não recria o banco, útil para repetir a medição com o mesmo conjunto de dados.")
+    parser.add_argument("--saida", type=Path, default=None,
+                        help="Arquivo JSON com os resultados (padrão: benchmark_results/<data>.json).")
+    parser.add_argument("--comparar", type=Path, default=None,
+                        help="Resultado JSON anterior, para mostrar a diferença entre as execuções.")
+    parser.add_argument("--serializacao", action="store_true",
+                        help="Mede somente a serialização das listagens (ORM + jsonable_encoder contra tuplas + orjson), sem subir o servidor.")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    sqlite_path = args.database_url.removeprefix("sqlite:///")
+    if not args.reusar_banco and args.database_url.startswith("sqlite:///"):
+        for suffix in ("", "-wal", "-shm"):
+            Path(sqlite_path + suffix).unlink(missing_ok=True)
+    user_id = get_benchmark_user_id(args.database_url)
+    if not args.reusar_banco:
+        inserted, elapsed = seed_tasks(
+            args.database_url, args.quantidade, seed=args.seed, owner_id=user_id)
+        print(f"{inserted} tarefas inseridas em {elapsed:.2f}s.")
+
+    if args.serializacao:
+        benchmark_serialization(args.database_url, PAGINATION_MAX_PER_PAGE,
+                                min(args.requisicoes, max(args.quantidade // PAGINATION_MAX_PER_PAGE, 1)))
+        sys.exit()
+
+    # Uma unica chave do JWT para todos os workers, senão o token do login é recusado pelos demais.
+    env = {**os.environ, "DATABASE_URL": args.database_url,
+           "USE_DATABASE_TEST": "0", "JWT_SECRET_KEY": os.environ.get("JWT_SECRET_KEY") or token_hex(32)}
+    base_url = f"http://127.0.0.1:{args.porta}"
+    server = subprocess.Popen([sys.executable, "-m", "uvicorn", "main:app", "--port", str(args.porta),
+                               "--workers", str(args.workers), "--log-level", "warning"], env=env)
+    try:
+        wait_until_ready(base_url, server)
+        results = asyncio.run(run_benchmark(base_url, args.quantidade, args.requisicoes,
+                                            args.concorrencia, PAGINATION_PER_PAGE, args.seed))
+    finally:
+        server.terminate()
+        server.wait()
+
+    output = args.saida or Path(
+        "benchmark_results") / f"{datetime.now():%Y%m%d-%H%M%S}.json"
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps({
+        "configuracao": {
+            "quantidade": args.quantidade,
+            "requisicoes": args.requisicoes,
+            "concorrencia": args.concorrencia,
+            "workers": args.workers,
+            "database_url": args.database_url,
+            "use_async_database": os.environ.get("USE_ASYNC_DATABASE", "0"),
+            "commit": get_git_commit(),
+            "data": datetime.now().isoformat(),
+        },
+        "cenarios": results,
+    }, indent=2, ensure_ascii=False))
+    print(f"\nResultados salvos em {output}")
+
+    if args.comparar:
+        compare(results, args.comparar)
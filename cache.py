@@ -0,0 +1,194 @@
+from threading import Lock
+from cachetools import LRUCache, TTLCache
+from hashlib import sha256
+from settings import TASK_LIST_CACHE_MAXSIZE, TASK_LIST_CACHE_TTL, TOKEN_CACHE_MAXSIZE, USER_CACHE_MAXSIZE, USER_CACHE_TTL
+import time
+
+
+class TaskListCache:
+    """
+        Cache das listagens de tarefas com invalidação por geração, separado por usuário.
+
+        Toda escrita nas tarefas de um usuário chama `invalidate(owner)`, que incrementa a geração
+        e descarta somente as paginas daquele usuário, `invalidate()` sem usuário descarta todas.
+        Uma leitura guarda a geração antes de consultar o banco e só grava o resultado se nenhuma
+        escrita do mesmo usuário aconteceu no meio, evitando listas antigas.
+
+        Leituras feitas em uma replica informam o atraso de replicação aceito (`replication_lag`)
+        e não são guardadas enquanto a ultima escrita for mais recente que esse atraso.
+
+        A invalidação de um usuário é esquecida após `ttl` segundos, quando as paginas guardadas
+        antes dela já expiraram, então o registro não cresce com o numero de usuários.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._ttl = ttl
+        self._lock = Lock()
+        self.generation = 0
+        self._cleared_generation = 0
+        self.invalidated_at = 0.0
+        # Geração e horario da ultima invalidação de cada usuário, em ordem de horario.
+        self._owner_invalidations = {}
+        # Maior geração entre as invalidações já esquecidas.
+        self._expired_generation = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _get_invalidation(self, owner):
+        return self._owner_invalidations.get(owner, (self._expired_generation, self.invalidated_at))
+
+    def _expire_invalidations(self, now: float):
+        while self._owner_invalidations:
+            owner, (generation, invalidated_at) = next(
+                iter(self._owner_invalidations.items()))
+            if now - invalidated_at < self._ttl:
+                break
+            del self._owner_invalidations[owner]
+            self._expired_generation = max(self._expired_generation, generation)
+
+    def get(self, key, owner=None):
+        with self._lock:
+            entry = self._cache.get((owner, key))
+            if entry is not None and entry[0] < self._get_invalidation(owner)[0]:
+                del self._cache[(owner, key)]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key, value, generation: int, replication_lag: float = 0, owner=None):
+        with self._lock:
+            invalidated_generation, invalidated_at = self._get_invalidation(
+                owner)
+            if generation < max(invalidated_generation, self._cleared_generation):
+                return False
+            last_write = max(invalidated_at, self.invalidated_at)
+            if replication_lag and time.monotonic() - last_write < replication_lag:
+                return False
+            self._cache[(owner, key)] = (generation, value)
+            return True
+
+    def invalidate(self, owner=None):
+        with self._lock:
+            self.generation += 1
+            if owner is None:
+                self.invalidated_at = time.monotonic()
+                self._cleared_generation = self.generation
+                self._owner_invalidations.clear()
+                self._cache.clear()
+            else:
+                now = time.monotonic()
+                self._expire_invalidations(now)
+                # Removido antes de gravar para ir ao fim da ordem de horario.
+                self._owner_invalidations.pop(owner, None)
+                self._owner_invalidations[owner] = (self.generation, now)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+
+class TokenCache:
+    """
+        LRU de tokens JWT já verificados, indexado pelo hash do token.
+
+        Cada entrada guarda as claims e expira junto com o "exp" do proprio token, então um
+        token expirado nunca é servido pelo cache e volta a ser verificado (e recusado) pelo PyJWT.
+    """
+
+    def __init__(self, maxsize: int):
+        self._cache = LRUCache(maxsize=maxsize)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(token: str):
+        return sha256(token.encode()).digest()
+
+    def get(self, token: str):
+        key = self._key(token)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry is not None and entry[1] <= time.time():
+                del self._cache[key]
+                entry = None
+
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[0]
+
+    def set(self, token: str, claims: dict):
+        expires_at = claims.get("exp")
+        if not isinstance(expires_at, (int, float)):
+            return
+        with self._lock:
+            self._cache[self._key(token)] = (claims, expires_at)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+
+class UserCache:
+    """
+        Usuários autenticados indexados pelo id (claim "sub" do token), para que os endpoints
+        protegidos recebam o usuário sem consultar o banco a cada requisição.
+
+        As entradas expiram após `ttl` segundos, e `invalidate(user_id)` deve ser chamado sempre
+        que os dados de um usuário mudarem ou ele for removido.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, user_id: int):
+        with self._lock:
+            user = self._cache.get(user_id)
+            if user is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            return user
+
+    def set(self, user_id: int, user):
+        with self._lock:
+            self._cache[user_id] = user
+
+    def invalidate(self, user_id: int):
+        with self._lock:
+            self._cache.pop(user_id, None)
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._cache)}
+
+
+task_list_cache = TaskListCache(
+    maxsize=TASK_LIST_CACHE_MAXSIZE, ttl=TASK_LIST_CACHE_TTL)
+token_cache = TokenCache(maxsize=TOKEN_CACHE_MAXSIZE)
+user_cache = UserCache(maxsize=USER_CACHE_MAXSIZE, ttl=USER_CACHE_TTL)
@@ -0,0 +1,73 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from fastapi import Request
+from fastapi.responses import Response
+from zoneinfo import ZoneInfo
+from serialization import RawJSONResponse
+import hashlib
+
+# Requisições condicionais (ETag e Last-Modified): um cliente que já tem a resposta envia
+# If-None-Match/If-Modified-Since e recebe 304 sem corpo quando nada mudou. O ETag das
+# listagens é o hash do corpo já serializado (que fica no cache) e o de uma tarefa vem do seu
+# id e da data de atualização, então o 304 é respondido sem gerar o JSON novamente.
+
+# As respostas são do usuário autenticado e precisam ser revalidadas a cada uso.
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(body: bytes):
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+
+def make_task_etag(row):
+    return make_etag(f"{row.id}:{row.data_atualizacao.isoformat()}".encode())
+
+
+def get_last_modified(value: datetime):
+    # Datas sem fuso vindas do banco estão no fuso da aplicação.
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=ZoneInfo("America/Sao_Paulo"))
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def get_cache_headers(etag: str, last_modified: datetime | None = None):
+    headers = {"ETag": etag, "Cache-Control": CACHE_CONTROL}
+    if last_modified is not None:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+    return headers
+
+
+def etag_matches(if_none_match: str, etag: str):
+    # O If-None-Match usa a comparação fraca, então "W/" é ignorado.
+    if if_none_match.strip() == "*":
+        return True
+    return etag in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+
+def is_not_modified(request: Request, etag: str, last_modified: datetime | None = None):
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # Com If-None-Match o If-Modified-Since é ignorado.
+        return etag_matches(if_none_match, etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is None or last_modified is None:
+        return False
+    try:
+        since = parsedate_to_datetime(if_modified_since)
+    except (TypeError, ValueError):
+        return False
+    if since.tzinfo is None:
+        return False
+    return last_modified <= since
+
+
+def not_modified_response(request: Request, etag: str, last_modified: datetime | None = None):
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=get_cache_headers(etag, last_modified))
+    return None
+
+
+def conditional_json_response(request: Request, body: bytes):
+    etag = make_etag(body)
+    return not_modified_response(request, etag) or RawJSONResponse(body, headers=get_cache_headers(etag))
@@ -0,0 +1,240 @@
+from fastapi import HTTPException
+from pydantic import ValidationError
+from sqlalchemy import delete, func, insert, update
+from sqlmodel import Session, select
+from cache import task_list_cache
+from filters import SORT_COLUMNS, TaskFilters
+from models.task import ALLOWED_STATES, PossiveisEstados, Task, TaskBulkUpdate, TaskCreate, TaskUpdate
+from models.user import User
+from search import get_search_query
+from settings import LIST_FILTER_SCAN_MAX_TASKS
+from serialization import TASK_COLUMNS, TASK_FIELDS, get_task_columns
+from utils import get_keyset_paginated_tasks, get_paginated_tasks, get_task_or_404, get_utc_now
+
+# Operações de banco usadas pelos endpoints. Todas recebem uma Session sincrona para que
+# possam rodar tanto em uma thread (modo sincrono) quanto via `AsyncSession.run_sync`.
+
+
+def get_filtered_task_query(owner_id: int, filters: TaskFilters = TaskFilters(), columns: tuple = (Task,)):
+    return filters.apply(select(*columns).where(Task.owner_id == owner_id))
+
+
+def get_sorted_task_columns(fields: tuple[str, ...], filters: TaskFilters):
+    # A coluna da ordenação é lida mesmo fora dos campos pedidos, pois forma o cursor da proxima
+    # pagina. Ela fica no final da linha, então não aparece na serialização por campos.
+    columns = get_task_columns(fields)
+    if filters.sort_field not in fields:
+        columns += (SORT_COLUMNS[filters.sort_field],)
+    return columns
+
+
+def check_task_query_plan(session: Session, owner_id: int, filters: TaskFilters):
+    """
+        Combinações de filtros e ordenação sem um indice que resolva as duas obrigam o banco a
+        ler e ordenar todas as tarefas do usuário, então só são aceitas até LIST_FILTER_SCAN_MAX_TASKS
+        tarefas. A contagem para no limite, sem percorrer as tarefas restantes.
+    """
+    if filters.get_index() is not None:
+        return
+    over_limit = session.exec(select(Task.id).where(Task.owner_id == owner_id).order_by(
+        Task.id).offset(LIST_FILTER_SCAN_MAX_TASKS).limit(1)).first()
+    if over_limit is not None:
+        raise HTTPException(
+            status_code=400, detail="Combinação de filtros e ordenação não suportada para esta quantidade de tarefas, combine o filtro de datas somente com a ordenação pela mesma data e o filtro de um unico estado somente com a ordenação por id.")
+
+
+def get_owned_task_or_404(session: Session, id: int, owner_id: int):
+    # Tarefas de outros usuários respondem 404, sem revelar que o id existe.
+    task = get_task_or_404(session=session, task=Task, id=id)
+    if task.owner_id != owner_id:
+        raise HTTPException(
+            status_code=404, detail="Tarefa não encontrada.")
+    return task
+
+
+def get_user_by_username(session: Session, username: str):
+    return session.exec(select(User).where(User.username == username)).first()
+
+
+def create_user(session: Session, username: str, hashed_password: str):
+    new_user = User(username=username, password=hashed_password)
+    session.add(new_user)
+    session.commit()
+    return new_user
+
+
+def read_task(session: Session, id: int, owner_id: int):
+    task_row = session.exec(select(*TASK_COLUMNS).where(
+        Task.id == id, Task.owner_id == owner_id)).first()
+    if not task_row:
+        raise HTTPException(
+            status_code=404, detail="Tarefa não encontrada.")
+    return task_row
+
+
+def list_tasks(session: Session, owner_id: int, pagina: int, tamanho: int, filters: TaskFilters = TaskFilters(), fields: tuple[str, ...] = TASK_FIELDS):
+    check_task_query_plan(session, owner_id, filters)
+    query = get_filtered_task_query(
+        owner_id, filters, get_task_columns(fields)).order_by(*filters.get_order_by())
+    paginated_query = get_paginated_tasks(
+        page=pagina, select_query=query, per_page=tamanho)
+    return session.exec(paginated_query).all()
+
+
+def list_tasks_after(session: Session, owner_id: int, last_key: tuple | None, tamanho: int, filters: TaskFilters = TaskFilters(), fields: tuple[str, ...] = TASK_FIELDS):
+    check_task_query_plan(session, owner_id, filters)
+    query = get_filtered_task_query(
+        owner_id, filters, get_sorted_task_columns(fields, filters))
+    paginated_query = get_keyset_paginated_tasks(
+        select_query=query, key_columns=filters.get_sort_columns(), last_key=last_key, per_page=tamanho, descending=filters.descending)
+    return session.exec(paginated_query).all()
+
+
+def search_tasks(session: Session, owner_id: int, terms: tuple[str, ...], pagina: int, tamanho: int, fields: tuple[str, ...] = TASK_FIELDS):
+    query = get_search_query(select(*get_task_columns(fields)).where(
+        Task.owner_id == owner_id), Task.id, owner_id, session.get_bind().dialect.name, terms)
+    paginated_query = get_paginated_tasks(
+        page=pagina, select_query=query, per_page=tamanho)
+    return session.exec(paginated_query).all()
+
+
+def count_tasks_by_state(session: Session, owner_id: int):
+    # Um unico GROUP BY, resolvido pelo indice (owner_id, estado, id) sem ler as linhas da tabela.
+    counts = dict(session.exec(select(Task.estado, func.count()).where(
+        Task.owner_id == owner_id).group_by(Task.estado)).all())
+    by_state = {state.value: counts.get(state, 0)
+                for state in PossiveisEstados}
+    return {"total": sum(by_state.values()), "estados": by_state}
+
+
+def update_task(session: Session, id: int, task: TaskUpdate, owner_id: int):
+    task_data = get_owned_task_or_404(session, id, owner_id)
+    task_serializer = task.model_dump(exclude_unset=True)
+    task_data.sqlmodel_update(task_serializer)
+
+    session.add(task_data)
+    session.commit()
+    task_list_cache.invalidate(owner_id)
+    session.refresh(task_data)
+    return task_data
+
+
+def create_task(session: Session, new_task: Task):
+    session.add(new_task)
+    session.commit()
+    task_list_cache.invalidate(new_task.owner_id)
+    session.refresh(new_task)
+    return new_task
+
+
+def delete_task(session: Session, id: int, owner_id: int):
+    task = get_owned_task_or_404(session, id, owner_id)
+
+    session.delete(task)
+    session.commit()
+    task_list_cache.invalidate(owner_id)
+
+
+def validate_new_tasks(items: list[dict]):
+    """
+        Valida cada item de uma criação em lote individualmente, retornando as linhas prontas
+        para o INSERT e os erros indexados pela posição do item na requisição.
+    """
+    rows, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            task_create = TaskCreate.model_validate(item)
+            new_task = Task.model_validate(task_create)
+        except ValidationError:
+            errors.append(
+                {"indice": index, "detail": TaskCreate.validation_error_message})
+            continue
+        rows.append(new_task.model_dump(exclude={"id"}))
+    return rows, errors
+
+
+REQUIRED_TASK_FIELDS = ("titulo", "estado")
+
+
+def validate_task_changes(items: list[dict]):
+    changes, errors = [], []
+    for index, item in enumerate(items):
+        try:
+            task = TaskBulkUpdate.model_validate(item)
+        except ValidationError:
+            errors.append(
+                {"indice": index, "detail": TaskUpdate.validation_error_message})
+            continue
+
+        row = task.model_dump(exclude_unset=True)
+        if any(field in row and row[field] is None for field in REQUIRED_TASK_FIELDS):
+            # Campos obrigatórios da tarefa não podem ser apagados com null.
+            errors.append(
+                {"indice": index, "detail": TaskUpdate.validation_error_message})
+            continue
+        if task.estado and not task.is_state_valid():
+            errors.append({"indice": index, "detail": {
+                          "estado": f'Somente 3 valores possiveis: {ALLOWED_STATES}'}})
+            continue
+
+        if "estado" in row:
+            row["estado"] = PossiveisEstados(row["estado"])
+        changes.append((index, row))
+    return changes, errors
+
+
+def get_existing_task_ids(session: Session, ids: list[int], owner_id: int):
+    return set(session.exec(select(Task.id).where(Task.id.in_(ids), Task.owner_id == owner_id)).all())
+
+
+def bulk_create_tasks(session: Session, rows: list[dict], owner_id: int):
+    rows = [{**row, "owner_id": owner_id} for row in rows]
+    tasks = session.scalars(insert(Task).returning(Task), rows).all()
+    session.commit()
+    task_list_cache.invalidate(owner_id)
+    return tasks
+
+
+def insert_tasks(session: Session, rows: list[dict], owner_id: int):
+    rows = [{**row, "owner_id": owner_id} for row in rows]
+    session.execute(insert(Task), rows)
+    session.commit()
+    task_list_cache.invalidate(owner_id)
+
+
+def bulk_update_tasks(session: Session, changes: list[tuple[int, dict]], owner_id: int):
+    # Somente ids do proprio usuário são atualizados, os demais viram "Tarefa não encontrada."
+    existing_ids = get_existing_task_ids(
+        session, [row["id"] for _, row in changes], owner_id)
+
+    rows, errors = [], []
+    now = get_utc_now()
+    for index, row in changes:
+        if row["id"] not in existing_ids:
+            errors.append({"indice": index, "detail": "Tarefa não encontrada."})
+            continue
+        rows.append({**row, "data_atualizacao": now})
+
+    if not rows:
+        return [], errors
+
+    session.execute(update(Task), rows)
+    session.commit()
+    task_list_cache.invalidate(owner_id)
+
+    updated_ids = {row["id"] for row in rows}
+    tasks = session.exec(select(Task).where(Task.id.in_(updated_ids)).order_by(
+        Task.id).execution_options(populate_existing=True)).all()
+    return tasks, errors
+
+
+def bulk_delete_tasks(session: Session, ids: list[int], owner_id: int):
+    existing_ids = get_existing_task_ids(session, ids, owner_id)
+    errors = [{"indice": index, "detail": "Tarefa não encontrada."}
+              for index, id in enumerate(ids) if id not in existing_ids]
+
+    if existing_ids:
+        session.execute(delete(Task).where(Task.id.in_(existing_ids)))
+        session.commit()
+        task_list_cache.invalidate(owner_id)
+    return sorted(existing_ids), errors
@@ -1,35 +1,290 @@
 from fastapi.security import OAuth2PasswordBearer
+from fastapi.concurrency import run_in_threadpool
+from cachetools import TTLCache
+from itertools import count
+from threading import Lock
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.pool import Pool, QueuePool
 from sqlmodel import Session, create_engine, SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
 from typing import Annotated
-from fastapi import Depends
-from dotenv import load_dotenv
-from pathlib import Path
-import os
+from fastapi import Depends, Request
+from functools import cache
+from settings import ASYNC_DATABASE_URL, DATABASE_REPLICA_URLS, DATABASE_URL, DB_MAX_OVERFLOW, DB_POOL_PRE_PING, DB_POOL_RECYCLE, DB_POOL_SIZE, DB_POOL_TIMEOUT, READ_YOUR_WRITES_SECONDS, SQLITE_BUSY_TIMEOUT, SQLITE_CACHE_SIZE, SQLITE_JOURNAL_MODE, SQLITE_MMAP_SIZE, SQLITE_SYNCHRONOUS, USE_ASYNC_DATABASE
+from migrations import run_migrations
+from metrics import instrument_engine, span
+from slow_queries import instrument_slow_queries
+import time
 
-parent_dir = Path(__file__).resolve().parent
-load_dotenv(parent_dir / ".env")
+SQLITE_PRAGMAS = {
+    "journal_mode": SQLITE_JOURNAL_MODE,
+    "synchronous": SQLITE_SYNCHRONOUS,
+    "busy_timeout": SQLITE_BUSY_TIMEOUT,
+    "mmap_size": SQLITE_MMAP_SIZE,
+    "cache_size": SQLITE_CACHE_SIZE,
+}
 
-is_test = int(os.environ.get("USE_DATABASE_TEST", 0))
-if is_test:
-    sqlite_url = os.environ.get(
-        "TEST_DATABASE_URL", "sqlite:///sqlite3_test.db")
-else:
-    sqlite_url = os.environ.get("DATABASE_URL", "sqlite:///sqlite3.db")
 
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    # Em WAL os leitores não são bloqueados por uma escrita, e com synchronous=NORMAL o fsync
+    # acontece somente nos checkpoints, que é seguro em WAL.
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        if value:
+            cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
 
-connect_args = {"check_same_thread": False}
-engine = create_engine(sqlite_url, connect_args=connect_args)
 
+def configure_engine(sync_engine):
+    if sync_engine.dialect.name == "sqlite":
+        event.listen(sync_engine, "connect", set_sqlite_pragmas)
+    return instrument_slow_queries(instrument_engine(sync_engine))
 
-def get_session():
+
+class PoolMetrics:
+    def __init__(self):
+        self._lock = Lock()
+        self.checkouts = 0
+        self.wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.overflow_events = 0
+        self.timeouts = 0
+
+    def record_checkout(self, waited: float, overflowed: bool):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_seconds += waited
+            self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            self.overflow_events += overflowed
+
+    def record_timeout(self):
+        with self._lock:
+            self.timeouts += 1
+
+    def stats(self):
+        return {
+            "checkouts": self.checkouts,
+            "espera_media_ms": round(self.wait_seconds / self.checkouts * 1000, 3) if self.checkouts else 0,
+            "espera_maxima_ms": round(self.max_wait_seconds * 1000, 3),
+            "eventos_overflow": self.overflow_events,
+            "timeouts": self.timeouts,
+        }
+
+
+def instrument_pool_class(pool_class: type[Pool], metrics: PoolMetrics | None):
+    # A subclasse carrega as metricas como atributo de classe, então elas continuam valendo
+    # quando o SQLAlchemy recria o pool (dispose/recreate usa a mesma classe).
+    class InstrumentedPool(pool_class):
+        def connect(self):
+            # Tempo para obter a conexão da sessão, exibido no perfil da requisição.
+            with span("sessao"):
+                return super().connect()
+
+        def _do_get(self):
+            if metrics is None:
+                return super()._do_get()
+            overflow_before = max(self._overflow, 0)
+            started_at = time.perf_counter()
+            try:
+                connection = super()._do_get()
+            except PoolTimeoutError:
+                metrics.record_timeout()
+                raise
+            metrics.record_checkout(time.perf_counter() - started_at,
+                                    self._overflow > overflow_before)
+            return connection
+
+    InstrumentedPool.__name__ = InstrumentedPool.__qualname__ = pool_class.__name__
+    InstrumentedPool.metrics = metrics
+    return InstrumentedPool
+
+
+monitored_engines = {}
+
+
+def get_pool_options(url: str):
+    parsed_url = make_url(url)
+    pool_class = parsed_url.get_dialect().get_pool_class(parsed_url)
+    if not issubclass(pool_class, QueuePool):
+        return {"poolclass": instrument_pool_class(pool_class, None)}
+    return {
+        "poolclass": instrument_pool_class(pool_class, PoolMetrics()),
+        "pool_size": DB_POOL_SIZE,
+        "max_overflow": DB_MAX_OVERFLOW,
+        "pool_timeout": DB_POOL_TIMEOUT,
+        "pool_recycle": DB_POOL_RECYCLE,
+        "pool_pre_ping": DB_POOL_PRE_PING,
+    }
+
+
+def create_database_engine(url: str, name: str | None = None):
+    connect_args = {}
+    if url.startswith("sqlite"):
+        connect_args["check_same_thread"] = False
+    database_engine = configure_engine(create_engine(
+        url, connect_args=connect_args, **get_pool_options(url)))
+    if name:
+        monitored_engines[name] = database_engine
+    return database_engine
+
+
+engine = create_database_engine(DATABASE_URL, "primario")
+replica_engines = [create_database_engine(url, f"replica_{index}")
+                   for index, url in enumerate(DATABASE_REPLICA_URLS)]
+
+
+def get_async_database_url(url: str):
+    if url.startswith("sqlite://"):
+        return url.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    if url.startswith(("postgresql://", "postgres://")):
+        return "postgresql+asyncpg://" + url.split("://", 1)[1]
+    return url
+
+
+def create_async_database_engine(url: str, name: str | None = None):
+    async_url = get_async_database_url(url)
+    async_engine = create_async_engine(
+        async_url, **get_pool_options(async_url))
+    configure_engine(async_engine.sync_engine)
+    if name:
+        monitored_engines[name] = async_engine.sync_engine
+    return async_engine
+
+
+@cache
+def get_async_engine():
+    # Criado somente quando usado, para o driver assincrono não ser obrigatório no modo sincrono.
+    return create_async_database_engine(ASYNC_DATABASE_URL or DATABASE_URL, "primario_async")
+
+
+@cache
+def get_async_replica_engines():
+    return [create_async_database_engine(url, f"replica_async_{index}")
+            for index, url in enumerate(DATABASE_REPLICA_URLS)]
+
+
+def get_pool_stats():
+    stats = {}
+    for name, database_engine in monitored_engines.items():
+        pool = database_engine.pool
+        pool_stats = {"pool": type(pool).__name__}
+        if isinstance(pool, QueuePool):
+            pool_stats.update({
+                "tamanho": pool.size(),
+                "max_overflow": pool._max_overflow,
+                "em_uso": pool.checkedout(),
+                "livres": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+            })
+        if getattr(pool, "metrics", None):
+            pool_stats.update(pool.metrics.stats())
+        stats[name] = pool_stats
+    return stats
+
+
+# Clientes que escreveram recentemente continuam lendo do primario por alguns segundos, para
+# sempre enxergarem as proprias escritas mesmo com atraso de replicação.
+recent_writers = TTLCache(maxsize=100000, ttl=READ_YOUR_WRITES_SECONDS)
+recent_writers_lock = Lock()
+replica_counter = count()
+
+
+def get_client_key(request: Request):
+    authorization = request.headers.get("authorization")
+    if authorization:
+        return authorization
+    return request.client.host if request.client else ""
+
+
+def mark_recent_write(client_key: str):
+    with recent_writers_lock:
+        recent_writers[client_key] = True
+
+
+def is_recent_writer(client_key: str):
+    with recent_writers_lock:
+        return client_key in recent_writers
+
+
+def pick_replica(engines: list, client_key: str):
+    if not engines or is_recent_writer(client_key):
+        return None
+    return engines[next(replica_counter) % len(engines)]
+
+
+def track_writes(session: Session, client_key: str):
+    if DATABASE_REPLICA_URLS:
+        event.listen(session, "after_commit",
+                     lambda session: mark_recent_write(client_key))
+
+
+def get_session(request: Request):
     with Session(engine) as session:
+        track_writes(session, get_client_key(request))
         yield session
 
 
+def get_read_session(request: Request):
+    read_engine = pick_replica(replica_engines, get_client_key(request))
+    with Session(read_engine or engine, info={"replica": read_engine is not None}) as session:
+        yield session
+
+
+async def get_async_session(request: Request):
+    async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+        track_writes(session.sync_session, get_client_key(request))
+        yield session
+
+
+async def get_async_read_session(request: Request):
+    read_engine = pick_replica(
+        get_async_replica_engines(), get_client_key(request))
+    async with AsyncSession(read_engine or get_async_engine(), expire_on_commit=False, info={"replica": read_engine is not None}) as session:
+        yield session
+
+
+def get_replication_lag(session: Session | AsyncSession):
+    # Tempo que uma leitura de replica pode estar atrasada em relação ao primario.
+    return READ_YOUR_WRITES_SECONDS if session.info.get("replica") else 0
+
+
 SessionDep = Annotated[Session, Depends(get_session)]
+AsyncSessionDep = Annotated[AsyncSession, Depends(get_async_session)]
+
+get_database_session = get_async_session if USE_ASYNC_DATABASE else get_session
+DatabaseSessionDep = Annotated[Session | AsyncSession,
+                               Depends(get_database_session)]
+
+# Sessões somente de leitura, que usam uma replica quando configurada.
+get_database_read_session = get_async_read_session if USE_ASYNC_DATABASE else get_read_session
+DatabaseReadSessionDep = Annotated[Session | AsyncSession,
+                                   Depends(get_database_read_session)]
+
+
+async def run_in_session(session: Session | AsyncSession, function, *args, **kwargs):
+    """
+        Executa uma operação sincrona de banco (que recebe a Session como primeiro argumento)
+        sem bloquear o event loop: via `run_sync` no modo assincrono ou em uma thread no modo sincrono.
+    """
+    if isinstance(session, AsyncSession):
+        return await session.run_sync(function, *args, **kwargs)
+    return await run_in_threadpool(function, session, *args, **kwargs)
+
 
 oauth_scheme = OAuth2PasswordBearer(tokenUrl="/api/auth/token")
 
 
-def create_db_and_tables():
-    SQLModel.metadata.create_all(engine)
+def create_db_and_tables(bind=engine):
+    SQLModel.metadata.create_all(bind)
+    run_migrations(bind)
+
+
+async def dispose_engines():
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+    if get_async_replica_engines.cache_info().currsize:
+        for replica_engine in get_async_replica_engines():
+            await replica_engine.dispose()
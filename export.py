@@ -0,0 +1,76 @@
+from sqlmodel import Session
+from sqlmodel.ext.asyncio.session import AsyncSession
+from database import engine, get_async_engine, get_async_replica_engines, pick_replica, replica_engines
+from serialization import TASK_COLUMNS, TASK_FIELDS, row_to_dict
+from settings import EXPORT_BATCH_SIZE, USE_ASYNC_DATABASE
+import csv
+import io
+import orjson
+
+# Exportação de tarefas em streaming: as linhas são lidas do banco em lotes (yield_per) e
+# enviadas assim que serializadas, então a memoria usada não depende do tamanho da tabela.
+
+EXPORT_COLUMNS = TASK_COLUMNS
+EXPORT_FIELDS = TASK_FIELDS
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+
+def row_to_values(row):
+    id, titulo, descricao, estado, data_criacao, data_atualizacao = row
+    return (id, titulo, descricao, estado.value, data_criacao.isoformat(), data_atualizacao.isoformat())
+
+
+def serialize_ndjson(rows, include_header: bool = False):
+    return b"".join(orjson.dumps(row_to_dict(row)) + b"\n" for row in rows)
+
+
+def serialize_csv(rows, include_header: bool = False):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if include_header:
+        writer.writerow(EXPORT_FIELDS)
+    writer.writerows(row_to_values(row) for row in rows)
+    return buffer.getvalue()
+
+
+SERIALIZERS = {"ndjson": serialize_ndjson, "csv": serialize_csv}
+
+
+def iter_tasks(query, formato: str, client_key: str):
+    serialize = SERIALIZERS[formato]
+    include_header = True
+    read_engine = pick_replica(replica_engines, client_key) or engine
+    with Session(read_engine) as session:
+        result = session.exec(query.execution_options(
+            yield_per=EXPORT_BATCH_SIZE))
+        for rows in result.partitions():
+            yield serialize(rows, include_header)
+            include_header = False
+
+    if include_header and formato == "csv":
+        yield serialize([], include_header)
+
+
+async def iter_tasks_async(query, formato: str, client_key: str):
+    serialize = SERIALIZERS[formato]
+    include_header = True
+    read_engine = pick_replica(
+        get_async_replica_engines(), client_key) or get_async_engine()
+    async with AsyncSession(read_engine) as session:
+        result = await session.stream(query.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        async for rows in result.partitions():
+            yield serialize(rows, include_header)
+            include_header = False
+
+    if include_header and formato == "csv":
+        yield serialize([], include_header)
+
+
+def stream_tasks(query, formato: str, client_key: str):
+    if USE_ASYNC_DATABASE:
+        return iter_tasks_async(query, formato, client_key)
+    return iter_tasks(query, formato, client_key)
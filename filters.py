@@ -0,0 +1,154 @@
+from dataclasses import dataclass
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from fastapi import HTTPException, Query
+from models.task import ALLOWED_STATE_FILTER, STATE_FILTERS, PossiveisEstados, Task
+from utils import decode_cursor, encode_cursor
+
+# Filtros e ordenação das listagens. Cada combinação é comparada com os indices da tabela
+# (todos começam pelo dono e terminam em "id"), assim é possivel saber antes da consulta se
+# ela será resolvida por um indice ou se o banco precisará ler e ordenar as tarefas do usuário.
+
+SORT_FIELDS = ("id", "data_criacao", "data_atualizacao")
+ALLOWED_SORTS = SORT_FIELDS + tuple("-" + field for field in SORT_FIELDS)
+SORT_COLUMNS = {
+    "id": Task.id,
+    "data_criacao": Task.data_criacao,
+    "data_atualizacao": Task.data_atualizacao,
+}
+SORT_INDEXES = {
+    "id": "ix_task_owner_id_id",
+    "data_criacao": "ix_task_owner_data_criacao_id",
+    "data_atualizacao": "ix_task_owner_data_atualizacao_id",
+}
+STATE_INDEX = "ix_task_owner_estado_id"
+
+
+@dataclass(frozen=True)
+class TaskFilters:
+    estados: tuple[PossiveisEstados, ...] = ()
+    criada_apos: datetime | None = None
+    criada_antes: datetime | None = None
+    atualizada_apos: datetime | None = None
+    atualizada_antes: datetime | None = None
+    ordenar: str = "id"
+
+    @property
+    def sort_field(self):
+        return self.ordenar.lstrip("-")
+
+    @property
+    def descending(self):
+        return self.ordenar.startswith("-")
+
+    def get_sort_columns(self):
+        # O "id" desempata datas iguais, então a ordem é sempre a mesma e serve de cursor.
+        if self.sort_field == "id":
+            return (Task.id,)
+        return (SORT_COLUMNS[self.sort_field], Task.id)
+
+    def get_order_by(self):
+        return tuple(column.desc() if self.descending else column for column in self.get_sort_columns())
+
+    def get_date_ranges(self):
+        ranges = (("data_criacao", self.criada_apos, self.criada_antes),
+                  ("data_atualizacao", self.atualizada_apos, self.atualizada_antes))
+        return {field: (after, before) for field, after, before in ranges
+                if after is not None or before is not None}
+
+    def get_index(self):
+        """
+            Retorna o indice que resolve os filtros e a ordenação juntos, ou None quando nenhum
+            indice resolve: um unico estado ordenado por id usa (owner_id, estado, id), sem estado
+            o intervalo de datas precisa ser na mesma coluna da ordenação.
+        """
+        date_fields = set(self.get_date_ranges())
+        if len(self.estados) == 1 and not date_fields and self.sort_field == "id":
+            return STATE_INDEX
+        if not self.estados and date_fields <= {self.sort_field}:
+            return SORT_INDEXES[self.sort_field]
+        return None
+
+    def apply(self, query):
+        if len(self.estados) == 1:
+            query = query.where(Task.estado == self.estados[0])
+        elif self.estados:
+            query = query.where(Task.estado.in_(self.estados))
+
+        for field, (after, before) in self.get_date_ranges().items():
+            column = SORT_COLUMNS[field]
+            if after is not None:
+                query = query.where(column >= after)
+            if before is not None:
+                query = query.where(column < before)
+        return query
+
+
+def parse_states(estado: str | None):
+    if not estado:
+        return ()
+
+    requested = {value.strip() for value in estado.split(",") if value.strip()}
+    if not requested or not requested <= set(ALLOWED_STATE_FILTER):
+        raise HTTPException(
+            status_code=400, detail=f"Possiveis filtros de estado: {ALLOWED_STATE_FILTER}")
+    if len(requested) == len(STATE_FILTERS):
+        # Todos os estados é o mesmo que não filtrar.
+        return ()
+    return tuple(state for value, state in STATE_FILTERS.items() if value in requested)
+
+
+def encode_task_cursor(row, filters: TaskFilters):
+    # O cursor leva a chave da ordenação (data e id), a ordenação padrão mantem somente o id.
+    values = {"id": row.id}
+    if filters.ordenar != "id":
+        values["ordenar"] = filters.ordenar
+    if filters.sort_field != "id":
+        values["valor"] = getattr(row, filters.sort_field).isoformat()
+    return encode_cursor(values)
+
+
+def decode_task_cursor(cursor: str | None, filters: TaskFilters):
+    if not cursor:
+        return None
+
+    values = decode_cursor(cursor)
+    last_id = values.get("id")
+    if not isinstance(last_id, int) or values.get("ordenar", "id") != filters.ordenar:
+        raise HTTPException(status_code=400, detail="Cursor invalido.")
+    if filters.sort_field == "id":
+        return (last_id,)
+
+    try:
+        return (datetime.fromisoformat(values["valor"]), last_id)
+    except (KeyError, TypeError, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor invalido.")
+
+
+def to_database_datetime(value: datetime | None):
+    # As datas são gravadas no fuso da aplicação e sem fuso no banco, datas com fuso são convertidas.
+    if value is None or value.tzinfo is None:
+        return value
+    return value.astimezone(ZoneInfo("America/Sao_Paulo")).replace(tzinfo=None)
+
+
+def get_task_filters(
+    estado: str | None = Query(None, description=f"Usado para filtrar tarefas pelo seu estado, onde há somente 3 possiveis valores: {ALLOWED_STATE_FILTER}, mais de um estado pode ser enviado separado por virgula (ex: \"pendente,andamento\"), caso este filtro seja enviado com valor incorreto, será gerado uma excessão."),
+    criada_apos: datetime | None = Query(None, description="Somente tarefas criadas a partir desta data (ISO 8601)."),
+    criada_antes: datetime | None = Query(None, description="Somente tarefas criadas antes desta data (ISO 8601)."),
+    atualizada_apos: datetime | None = Query(None, description="Somente tarefas atualizadas a partir desta data (ISO 8601)."),
+    atualizada_antes: datetime | None = Query(None, description="Somente tarefas atualizadas antes desta data (ISO 8601)."),
+    ordenar: str = Query("id", description=f"Campo usado para ordenar as tarefas, com \"-\" na frente para ordem decrescente, possiveis valores: {ALLOWED_SORTS}. Para muitas tarefas, o filtro de datas só pode ser combinado com a ordenação pela mesma data e um unico estado só pode ser combinado com a ordenação por id."),
+):
+    if ordenar not in ALLOWED_SORTS:
+        raise HTTPException(
+            status_code=400, detail=f"Possiveis ordenações: {ALLOWED_SORTS}")
+
+    for after, before in ((criada_apos, criada_antes), (atualizada_apos, atualizada_antes)):
+        if after is not None and before is not None and to_database_datetime(after) >= to_database_datetime(before):
+            raise HTTPException(
+                status_code=400, detail="Intervalo de datas invalido.")
+
+    return TaskFilters(estados=parse_states(estado), criada_apos=to_database_datetime(criada_apos),
+                       criada_antes=to_database_datetime(criada_antes), atualizada_apos=to_database_datetime(atualizada_apos),
+                       atualizada_antes=to_database_datetime(atualizada_antes), ordenar=ordenar)
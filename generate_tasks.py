@@ -1,26 +1,113 @@
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
 from faker import Faker
-from database import Session, engine, SQLModel
-from models.task import ALLOWED_STATES, Task
+from sqlalchemy import insert, make_url
+from database import create_database_engine, create_db_and_tables
+from models.task import PossiveisEstados, Task
+from settings import DATABASE_URL
+from utils import get_utc_now
+import logging
+import multiprocessing
+import random
+import time
 
-if __name__ == "__main__":
+# Gerar textos com o Faker para cada linha é o que mais custa, então cada processo gera um
+# conjunto de textos uma vez e sorteia entre eles ao montar as linhas.
+TEXT_POOL_SIZE = 1000
+MAX_AGE = timedelta(days=365)
+
+logger = logging.getLogger("generate_tasks")
+
+
+def build_text_pool(seed: int):
     fk = Faker()
-    SQLModel.metadata.create_all(bind=engine)
-    with Session(bind=engine) as session:
-
-        for task in range(100):
-            will_not_have_description = fk.boolean(20)
-            fk_titulo = fk.sentence(nb_words=3)
-            if will_not_have_description:
-                fk_descricao = None
-            else:
-                fk_descricao = fk.text(max_nb_chars=100)
-            estado = ALLOWED_STATES[fk.random_int(min=0, max=2)]
-
-            new_task = Task(
-                titulo=fk_titulo,
-                descricao=fk_descricao,
-                estado=estado
-            )
-
-            session.add(new_task)
-            session.commit()
+    fk.seed_instance(seed)
+    titles = [fk.sentence(nb_words=3) for _ in range(TEXT_POOL_SIZE)]
+    descriptions = [fk.text(max_nb_chars=100)
+                    for _ in range(TEXT_POOL_SIZE)]
+    return titles, descriptions
+
+
+def build_rows(amount: int, titles: list[str], descriptions: list[str], rng: random.Random, owner_id: int | None = None):
+    now = get_utc_now()
+    states = list(PossiveisEstados)
+    max_age = MAX_AGE.total_seconds()
+    rows = []
+    for _ in range(amount):
+        created_at = now - timedelta(seconds=rng.uniform(0, max_age))
+        updated_at = created_at + \
+            timedelta(seconds=rng.uniform(0, (now - created_at).total_seconds()))
+        rows.append({
+            "titulo": rng.choice(titles),
+            "descricao": None if rng.random() < 0.2 else rng.choice(descriptions),
+            "estado": rng.choice(states),
+            "data_criacao": created_at,
+            "data_atualizacao": updated_at,
+            "owner_id": owner_id,
+        })
+    return rows
+
+
+def insert_tasks(database_url: str, amount: int, batch_size: int, seed: int, owner_id: int | None = None):
+    engine = create_database_engine(database_url)
+    rng = random.Random(seed)
+    titles, descriptions = build_text_pool(seed)
+
+    inserted = 0
+    while inserted < amount:
+        rows = build_rows(min(batch_size, amount - inserted),
+                          titles, descriptions, rng, owner_id)
+        # Um INSERT com varias linhas e uma transação por lote.
+        with engine.begin() as connection:
+            connection.execute(insert(Task.__table__), rows)
+        inserted += len(rows)
+    engine.dispose()
+    return inserted
+
+
+def seed_tasks(database_url: str, amount: int, batch_size: int = 10000, workers: int = 1, seed: int = 0, owner_id: int | None = None):
+    engine = create_database_engine(database_url)
+    create_db_and_tables(engine)
+    engine.dispose()
+
+    if workers > 1 and make_url(database_url).get_backend_name() == "sqlite":
+        # O SQLite aceita um unico escritor: processos em paralelo disputam o lock do banco e
+        # desistem depois do busy_timeout ("database is locked"), então usa um processo só.
+        logger.warning(
+            "SQLite aceita um unico escritor, usando 1 processo em vez de %s.", workers)
+        workers = 1
+
+    shares = [amount // workers + (1 if worker < amount % workers else 0)
+              for worker in range(workers)]
+    started_at = time.perf_counter()
+    if workers == 1:
+        inserted = insert_tasks(
+            database_url, amount, batch_size, seed, owner_id)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            inserted = sum(executor.map(insert_tasks, [database_url] * workers, shares,
+                                        [batch_size] * workers, [seed + worker for worker in range(workers)], [owner_id] * workers))
+    return inserted, time.perf_counter() - started_at
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser(
+        description="Gera tarefas aleatorias e insere no banco de dados da aplicação.")
+    parser.add_argument("--quantidade", type=int, default=100,
+                        help="Quantidade de tarefas geradas (padrão: 100).")
+    parser.add_argument("--lote", type=int, default=10000,
+                        help="Quantidade de tarefas inseridas por transação (padrão: 10000).")
+    parser.add_argument("--processos", type=int, default=1,
+                        help="Quantidade de processos gerando tarefas em paralelo (padrão: 1). Somente para Postgres, no SQLite sempre é usado um processo.")
+    parser.add_argument("--database-url", default=DATABASE_URL,
+                        help="Banco de dados usado (padrão: DATABASE_URL do .env).")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Semente dos dados aleatorios, para gerar bancos reproduziveis.")
+    parser.add_argument("--dono", type=int, required=True,
+                        help="Id do usuário dono das tarefas geradas, cada usuário só enxerga as proprias tarefas.")
+    args = parser.parse_args()
+
+    inserted, elapsed = seed_tasks(database_url=args.database_url, amount=args.quantidade,
+                                   batch_size=args.lote, workers=max(args.processos, 1), seed=args.seed, owner_id=args.dono)
+    print(f"{inserted} tarefas inseridas em {elapsed:.2f}s ({inserted / elapsed:,.0f} tarefas/s).")
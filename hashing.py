@@ -0,0 +1,77 @@
+from concurrent.futures import ProcessPoolExecutor
+from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
+from metrics import span
+from passlib.context import CryptContext
+from settings import BCRYPT_ROUNDS, HASHING_MAX_PENDING, HASHING_WORKERS
+from threading import Lock
+import asyncio
+import multiprocessing
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+
+def generate_hashed_pwd(password: str):
+    return pwd_context.hash(password)
+
+
+def check_hashed_pwd(plain: str, hashed: str):
+    return pwd_context.verify(plain, hashed)
+
+
+class HashingExecutor:
+    """
+        Executa o bcrypt em um pool de processos separado, para que o custo de CPU do hash
+        não segure o GIL do worker que atende os demais endpoints.
+
+        Quando há mais de `max_pending` hashes em andamento ou na fila, novas chamadas são
+        recusadas com 429 em vez de acumular latência. Com `workers=0` o hash roda no pool de threads.
+    """
+
+    def __init__(self, workers: int, max_pending: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.pending = 0
+        self._executor = None
+        self._lock = Lock()
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn"))
+            return self._executor
+
+    async def run(self, function, *args):
+        with self._lock:
+            if self.pending >= self.max_pending:
+                raise HTTPException(status_code=429, detail="Servidor ocupado, tente novamente.",
+                                    headers={"Retry-After": "1"})
+            self.pending += 1
+
+        try:
+            with span("bcrypt"):
+                if not self.workers:
+                    return await run_in_threadpool(function, *args)
+                future = self._get_executor().submit(function, *args)
+                return await asyncio.wrap_future(future)
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+    async def hash(self, password: str):
+        return await self.run(generate_hashed_pwd, password)
+
+    async def verify(self, plain: str, hashed: str):
+        return await self.run(check_hashed_pwd, plain, hashed)
+
+    def shutdown(self):
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(cancel_futures=True)
+                self._executor = None
+
+
+hashing_executor = HashingExecutor(
+    workers=HASHING_WORKERS, max_pending=HASHING_MAX_PENDING)
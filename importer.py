@@ -0,0 +1,121 @@
+from crud import validate_new_tasks
+import codecs
+import csv
+import json
+
+# Importação de tarefas em streaming: o corpo da requisição é lido em pedaços e cada registro
+# é convertido em um dicionario assim que chega, sem carregar o arquivo inteiro na memoria.
+
+
+async def iter_lines(chunks):
+    pending = b""
+    # Arquivos salvos pelo Excel começam com o BOM do UTF-8, que não faz parte do conteudo.
+    first_line = True
+    async for chunk in chunks:
+        pending += chunk
+        if first_line and len(pending) < len(codecs.BOM_UTF8) and codecs.BOM_UTF8.startswith(pending):
+            continue
+        if first_line:
+            pending = pending.removeprefix(codecs.BOM_UTF8)
+            first_line = False
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line.decode("utf-8", errors="replace").rstrip("\r")
+    if first_line:
+        pending = pending.removeprefix(codecs.BOM_UTF8)
+    if pending:
+        yield pending.decode("utf-8", errors="replace").rstrip("\r")
+
+
+async def iter_ndjson_records(lines):
+    async for line in lines:
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError:
+            yield None
+            continue
+        yield record if isinstance(record, dict) else None
+
+
+async def iter_csv_records(lines):
+    header = None
+    record = ""
+    async for line in lines:
+        record = f"{record}\n{line}" if record else line
+        # Um campo entre aspas pode conter quebras de linha, o registro só termina com aspas pareadas.
+        if record.count('"') % 2:
+            continue
+        if not record.strip():
+            record = ""
+            continue
+
+        values = next(csv.reader([record]))
+        record = ""
+        if header is None:
+            header = values
+            continue
+        if len(values) != len(header):
+            yield None
+            continue
+
+        row = dict(zip(header, values))
+        if row.get("descricao") == "":
+            row["descricao"] = None
+        yield row
+
+    if record.strip():
+        yield None
+
+
+RECORD_PARSERS = {"ndjson": iter_ndjson_records, "csv": iter_csv_records}
+
+
+class TaskImport:
+    """
+        Acumula os registros recebidos em lotes validados, guardando o resumo da importação.
+    """
+
+    def __init__(self, batch_size: int, max_errors: int):
+        self.batch_size = batch_size
+        self.max_errors = max_errors
+        self.accepted = 0
+        self.rejected = 0
+        self.errors = []
+        self._records = []
+        self._first_record = 1
+
+    def add(self, record: dict | None):
+        self._records.append(record)
+        return len(self._records) >= self.batch_size
+
+    def take_batch(self):
+        records, first_record = self._records, self._first_record
+        self._records = []
+        self._first_record += len(records)
+
+        valid_records, invalid_lines = [], []
+        for index, record in enumerate(records):
+            if record is None:
+                invalid_lines.append(
+                    {"indice": index, "detail": "Registro mal formatado."})
+            else:
+                valid_records.append((index, record))
+
+        rows, errors = validate_new_tasks(
+            [record for _, record in valid_records])
+        errors = invalid_lines + [{"indice": valid_records[error["indice"]][0], "detail": error["detail"]}
+                                  for error in errors]
+
+        self.accepted += len(rows)
+        self.rejected += len(errors)
+        for error in sorted(errors, key=lambda error: error["indice"]):
+            if len(self.errors) >= self.max_errors:
+                break
+            self.errors.append(
+                {"registro": first_record + error["indice"], "detail": error["detail"]})
+        return rows
+
+    def summary(self):
+        return {"aceitas": self.accepted, "rejeitadas": self.rejected, "erros": self.errors}
@@ -1,29 +1,77 @@
 
-from typing import Annotated
-from fastapi import Depends, FastAPI, HTTPException, Query, Path
+from typing import Annotated, Any, Literal
+from fastapi import Body, Depends, FastAPI, HTTPException, Query, Path, Request
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
 from pydantic import ValidationError
-from database import create_db_and_tables, SessionDep
-from models.task import ALLOWED_STATE_FILTER, Task, TaskCreate, TaskSerializer, TaskUpdate
-from sqlmodel import select
-from models.user import User, UserCreate, TokenJWT, UserSerializer
-from utils import check_hashed_pwd, encode_user, generate_hashed_pwd, get_paginated_tasks, get_task_or_404, get_current_user
+from database import create_db_and_tables, dispose_engines, get_client_key, get_pool_stats, get_replication_lag, run_in_session, DatabaseReadSessionDep, DatabaseSessionDep
+from models.task import Task, TaskBulkDelete, TaskBulkDeleteResult, TaskBulkResult, TaskCreate, TaskCursorPage, TaskSerializer, TaskSummary, TaskUpdate
+from models.user import UserCreate, TokenJWT, UserSerializer
+from utils import encode_user
+from auth import get_current_user
+from conditional import conditional_json_response, get_cache_headers, get_last_modified, make_task_etag, not_modified_response
+from filters import TaskFilters, decode_task_cursor, encode_task_cursor, get_task_filters
+from hashing import hashing_executor
+from settings import BULK_MAX_ITEMS, IMPORT_BATCH_SIZE, IMPORT_MAX_ERRORS, PAGINATION_MAX_PER_PAGE, PAGINATION_PER_PAGE
 from contextlib import asynccontextmanager
 from apidocs import responses
-from cachetools import TTLCache
+from cache import task_list_cache, token_cache, user_cache
+from metrics import MetricsMiddleware, labels, metrics_registry
+from profiling import ProfiledRoute, ProfilingMiddleware
+from search import parse_search_terms
+from serialization import TASK_FIELDS, RawJSONResponse, dump_summary, dump_task, dump_task_page, dump_tasks, parse_fields, task_to_row
+import crud
+import export
+import importer
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     create_db_and_tables()
     yield
+    hashing_executor.shutdown()
+    await dispose_engines()
 
-cache = TTLCache(maxsize=120, ttl=15)
+cache = task_list_cache
 app = FastAPI(lifespan=lifespan, title="API de Gerenciamento de Tarefas")
+app.router.route_class = ProfiledRoute
+app.add_middleware(ProfilingMiddleware)
+app.add_middleware(MetricsMiddleware, registry=metrics_registry)
+
+
+def get_hit_ratio(hits: int, misses: int):
+    return hits / (hits + misses) if hits + misses else 0.0
+
+
+def get_runtime_gauges():
+    token_stats = token_cache.stats()
+    user_stats = user_cache.stats()
+    pool_stats = get_pool_stats()
+    return {
+        "task_list_cache_hits": ("Acertos do cache de listagens.", {"": cache.hits}),
+        "task_list_cache_misses": ("Falhas do cache de listagens.", {"": cache.misses}),
+        "task_list_cache_hit_ratio": ("Taxa de acerto do cache de listagens.", {"": get_hit_ratio(cache.hits, cache.misses)}),
+        "task_list_cache_entries": ("Paginas guardadas no cache de listagens.", {"": len(cache)}),
+        "token_cache_hit_ratio": ("Taxa de acerto do cache de tokens.", {"": get_hit_ratio(token_stats["hits"], token_stats["misses"])}),
+        "token_cache_entries": ("Tokens guardados no cache.", {"": token_stats["size"]}),
+        "user_cache_hit_ratio": ("Taxa de acerto do cache de usuários.", {"": get_hit_ratio(user_stats["hits"], user_stats["misses"])}),
+        "user_cache_entries": ("Usuários guardados no cache.", {"": user_stats["size"]}),
+        "db_pool_checked_out": ("Conexões em uso em cada pool.", {labels(engine=name): stats["em_uso"] for name, stats in pool_stats.items() if "em_uso" in stats}),
+        "db_pool_overflow": ("Conexões em overflow em cada pool.", {labels(engine=name): stats["overflow"] for name, stats in pool_stats.items() if "overflow" in stats}),
+    }
+
+
+def check_bulk_size(items: list):
+    if not items:
+        raise HTTPException(
+            status_code=400, detail="Envie pelo menos uma tarefa.")
+    if len(items) > BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=400, detail=f"Maximo de {BULK_MAX_ITEMS} tarefas por requisição.")
 
 
 @app.post("/api/auth/token", response_model=TokenJWT, responses=responses.login_user)
-def login_user(session: SessionDep, form: Annotated[OAuth2PasswordRequestForm, Depends()]):
+async def login_user(session: DatabaseSessionDep, form: Annotated[OAuth2PasswordRequestForm, Depends()]):
     """
         Este endpoint é aberto e autentica um usuário, permitindo acesso aos endpoints protegidos.
 
@@ -33,21 +81,20 @@ def login_user(session: SessionDep, form: Annotated[OAuth2PasswordRequestForm, D
         Os demais campos não são necessários, pode ignorar.
     """
 
-    user_db = session.exec(select(User).where(
-        User.username == form.username)).first()
+    user_db = await run_in_session(session, crud.get_user_by_username, form.username)
     if not user_db:
         raise HTTPException(status_code=400, detail="Credenciais invalidos.")
 
-    if not check_hashed_pwd(form.password, user_db.password):
+    if not await hashing_executor.verify(form.password, user_db.password):
         raise HTTPException(status_code=400, detail="Credenciais invalidos.")
 
-    token = encode_user(
-        {"username": user_db.username, "password": form.password})
+    # O token carrega somente o id do usuário (o "sub" precisa ser uma string no JWT).
+    token = encode_user({"sub": str(user_db.id)})
     return TokenJWT(access_token=token, token_type="bearer")
 
 
 @app.post("/api/user/create", responses=responses.create_user)
-def create_users(session: SessionDep, user: UserCreate):
+async def create_users(session: DatabaseSessionDep, user: UserCreate):
     """
         Este endpoint é aberto e cria um novo usuário, que é necessário para poder acessar os demais endpoints que são protegidos por autenticação, com exclusão do "Login User" que também é aberto.
 
@@ -55,53 +102,218 @@ def create_users(session: SessionDep, user: UserCreate):
         - **password**: senha do usuário, obrigatório e deve ser String.
     """
     validated_data = user.validate_data()
-    is_user_already_created = session.exec(select(User).where(
-        User.username == user.username)).first()
+    is_user_already_created = await run_in_session(session, crud.get_user_by_username, user.username)
 
     if is_user_already_created:
         raise HTTPException(status_code=400, detail="Usuário já existe.")
 
-    hashed_password = generate_hashed_pwd(validated_data.password)
+    hashed_password = await hashing_executor.hash(validated_data.password)
 
-    new_user = User(username=validated_data.username, password=hashed_password)
-    session.add(new_user)
-    session.commit()
+    await run_in_session(session, crud.create_user, validated_data.username, hashed_password)
     return {"ok": True}
 
 
+@app.get("/api/tasks/list", response_model=TaskCursorPage, responses=responses.list_tasks_cursor)
+async def list_tasks_cursor(request: Request, session: DatabaseReadSessionDep, cursor: str | None = Query(None, description="Cursor opaco retornado em \"proximo_cursor\" pela pagina anterior, caso não seja enviado, será retornada a primeira pagina."), tamanho: int = Query(PAGINATION_PER_PAGE, ge=1, le=PAGINATION_MAX_PER_PAGE, description="Quantidade de tarefas por pagina."), filters: TaskFilters = Depends(get_task_filters), fields: str | None = Query(None, description=f"Campos retornados em cada tarefa, separados por virgula (ex: \"id,titulo,estado\"), possiveis campos: {TASK_FIELDS}. O \"id\" é sempre retornado, caso não seja enviado, todos os campos serão retornados."), current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Endpoint para listar tarefas usando paginação por cursor, o custo de cada pagina é o mesmo independente da profundidade, ao contrário da paginação por numero de pagina.
+
+        Para acessar a proxima pagina, envie o valor de "proximo_cursor" no parametro "cursor", quando "proximo_cursor" for nulo não há mais tarefas.
+
+        As tarefas podem ser filtradas por um ou mais estados e por intervalos de data de criação/atualização, e ordenadas por id ou por uma das datas (o cursor continua na mesma ordenação). Para usuários com muitas tarefas, somente as combinações resolvidas por um indice são aceitas.
+    """
+    last_key = decode_task_cursor(cursor, filters)
+    fields = parse_fields(fields)
+    cache_key = ("cursor", last_key, tamanho, filters, fields)
+    cached_page = cache.get(cache_key, current_user.id)
+    if cached_page is not None:
+        return conditional_json_response(request, cached_page)
+
+    generation = cache.generation
+    tasks = await run_in_session(session, crud.list_tasks_after, current_user.id, last_key, tamanho, filters, fields)
+
+    next_cursor = None
+    if len(tasks) > tamanho:
+        tasks = tasks[:tamanho]
+        next_cursor = encode_task_cursor(tasks[-1], filters)
+
+    page = dump_task_page(tasks, next_cursor, fields)
+    cache.set(cache_key, page, generation,
+              get_replication_lag(session), current_user.id)
+    return conditional_json_response(request, page)
+
+
+@app.post("/api/tasks/bulk", response_model=TaskBulkResult, responses=responses.bulk_tasks)
+async def bulk_create_tasks(session: DatabaseSessionDep, tarefas: Annotated[list[dict[str, Any]], Body()], current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Este endpoint é usado para criar varias tarefas de uma vez, com um unico INSERT e uma unica transação.
+
+        Recebe uma lista de tarefas com os mesmos campos do endpoint de criação (**titulo**, **descricao** e **estado**), cada tarefa é validada individualmente, as invalidas são retornadas em "erros" com o seu "indice" na lista e as demais são criadas normalmente.
+    """
+    check_bulk_size(tarefas)
+    rows, errors = crud.validate_new_tasks(tarefas)
+
+    tasks = []
+    if rows:
+        tasks = await run_in_session(session, crud.bulk_create_tasks, rows, current_user.id)
+    return {"tarefas": tasks, "erros": errors}
+
+
+@app.patch("/api/tasks/bulk", response_model=TaskBulkResult, responses=responses.bulk_tasks)
+async def bulk_update_tasks(session: DatabaseSessionDep, tarefas: Annotated[list[dict[str, Any]], Body()], current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Este endpoint é usado para atualizar varias tarefas de uma vez, em uma unica transação.
+
+        Recebe uma lista onde cada item tem o **id** da tarefa e os campos que serão atualizados (**titulo**, **descricao** e **estado**, todos opcionais), itens invalidos ou com tarefas que não existem são retornados em "erros" com o seu "indice" na lista.
+    """
+    check_bulk_size(tarefas)
+    changes, errors = crud.validate_task_changes(tarefas)
+
+    tasks = []
+    if changes:
+        tasks, not_found_errors = await run_in_session(session, crud.bulk_update_tasks, changes, current_user.id)
+        errors = sorted(errors + not_found_errors,
+                        key=lambda error: error["indice"])
+    return {"tarefas": tasks, "erros": errors}
+
+
+@app.delete("/api/tasks/bulk", response_model=TaskBulkDeleteResult, responses=responses.bulk_delete_tasks)
+async def bulk_delete_tasks(session: DatabaseSessionDep, tarefas: TaskBulkDelete, current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Este endpoint é usado para excluir varias tarefas de uma vez, com um unico DELETE.
+
+        - **ids**: lista de identificadores das tarefas, os que não existirem são retornados em "erros" com o seu "indice" na lista.
+    """
+    check_bulk_size(tarefas.ids)
+
+    ids, errors = await run_in_session(session, crud.bulk_delete_tasks, tarefas.ids, current_user.id)
+    return {"ids": ids, "erros": errors}
+
+
+@app.get("/api/tasks/export", response_class=StreamingResponse, responses=responses.export_tasks)
+async def export_tasks(request: Request, formato: Literal["ndjson", "csv"] = Query("ndjson", description="Formato do arquivo exportado, \"ndjson\" (uma tarefa em JSON por linha) ou \"csv\"."), filters: TaskFilters = Depends(get_task_filters), current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Este endpoint é usado para exportar todas as tarefas do usuário (ou somente as filtradas, com os mesmos filtros das listagens) de uma vez.
+
+        O arquivo é enviado em streaming enquanto as tarefas são lidas do banco em lotes, então o download começa imediatamente e o servidor não carrega a tabela inteira na memoria.
+    """
+    query = crud.get_filtered_task_query(
+        current_user.id, filters, columns=export.EXPORT_COLUMNS).order_by(*filters.get_order_by())
+
+    return StreamingResponse(export.stream_tasks(query, formato, get_client_key(request)), media_type=export.EXPORT_MEDIA_TYPES[formato], headers={
+        "Content-Disposition": f'attachment; filename="tarefas.{formato}"'
+    })
+
+
+@app.post("/api/tasks/import", responses=responses.import_tasks)
+async def import_tasks(request: Request, session: DatabaseSessionDep, formato: Literal["ndjson", "csv"] = Query("ndjson", description="Formato do arquivo enviado no corpo da requisição, \"ndjson\" (uma tarefa em JSON por linha) ou \"csv\" (com cabeçalho)."), current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Este endpoint é usado para importar um arquivo grande de tarefas, enviado diretamente no corpo da requisição.
+
+        Cada registro precisa dos campos **titulo**, **descricao** (opcional) e **estado**, os demais campos são ignorados, então um arquivo do endpoint de exportação pode ser importado novamente.
+
+        O arquivo é lido em streaming e as tarefas são inseridas em lotes, registros invalidos não interrompem a importação e são retornados em "erros" (limitado aos primeiros) com a sua posição no arquivo.
+    """
+    task_import = importer.TaskImport(
+        batch_size=IMPORT_BATCH_SIZE, max_errors=IMPORT_MAX_ERRORS)
+    records = importer.RECORD_PARSERS[formato](
+        importer.iter_lines(request.stream()))
+
+    async for record in records:
+        if task_import.add(record):
+            rows = task_import.take_batch()
+            if rows:
+                await run_in_session(session, crud.insert_tasks, rows, current_user.id)
+
+    rows = task_import.take_batch()
+    if rows:
+        await run_in_session(session, crud.insert_tasks, rows, current_user.id)
+    return task_import.summary()
+
+
+@app.get("/api/tasks/summary", response_model=TaskSummary, responses=responses.summary_tasks)
+async def summary_tasks(request: Request, session: DatabaseReadSessionDep, current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Endpoint que retorna o total de tarefas e a quantidade de tarefas em cada estado, útil para calcular a quantidade de paginas da listagem.
+
+        As contagens ficam em cache e são recalculadas somente depois de uma escrita nas tarefas do usuário.
+    """
+    cache_key = ("resumo",)
+    cached_summary = cache.get(cache_key, current_user.id)
+    if cached_summary is not None:
+        return conditional_json_response(request, cached_summary)
+
+    generation = cache.generation
+    summary = dump_summary(await run_in_session(session, crud.count_tasks_by_state, current_user.id))
+
+    cache.set(cache_key, summary, generation,
+              get_replication_lag(session), current_user.id)
+    return conditional_json_response(request, summary)
+
+
+@app.get("/api/tasks/search", responses=responses.search_tasks)
+async def search_tasks(request: Request, session: DatabaseReadSessionDep, termo: str = Query(..., min_length=1, max_length=200, description="Palavras buscadas no titulo e na descricao das tarefas, todas precisam aparecer e cada palavra também encontra as que começam com ela (ex: \"merc\" encontra \"mercado\")."), pagina: int = Query(1, ge=1, description="Pagina dos resultados."), tamanho: int = Query(PAGINATION_PER_PAGE, ge=1, le=PAGINATION_MAX_PER_PAGE, description="Quantidade de tarefas por pagina."), fields: str | None = Query(None, description=f"Campos retornados em cada tarefa, separados por virgula (ex: \"id,titulo,estado\"), possiveis campos: {TASK_FIELDS}. O \"id\" é sempre retornado, caso não seja enviado, todos os campos serão retornados."), current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Endpoint para buscar tarefas pelo texto do titulo e da descricao, usando o indice de texto do banco (FTS5 no SQLite, tsvector no Postgres) em vez de percorrer todas as tarefas.
+
+        Os resultados são ordenados pela relevancia, tarefas com as palavras no titulo aparecem primeiro, e paginados pelo parametro "pagina".
+    """
+    terms = parse_search_terms(termo)
+    fields = parse_fields(fields)
+    cache_key = ("busca", terms, pagina, tamanho, fields)
+    cached_tasks = cache.get(cache_key, current_user.id)
+    if cached_tasks is not None:
+        return conditional_json_response(request, cached_tasks)
+
+    generation = cache.generation
+    tasks = dump_tasks(await run_in_session(session, crud.search_tasks, current_user.id, terms, pagina, tamanho, fields), fields)
+
+    cache.set(cache_key, tasks, generation,
+              get_replication_lag(session), current_user.id)
+    return conditional_json_response(request, tasks)
+
+
 @app.get("/api/tasks/{id}", responses=responses.read_task)
-def read_tasks(session: SessionDep, id: int = Path(..., title="ID", description="Este valor é usado identificar uma tarefa"), current_user: UserSerializer = Depends(get_current_user)):
+async def read_tasks(request: Request, session: DatabaseReadSessionDep, id: int = Path(..., title="ID", description="Este valor é usado identificar uma tarefa"), current_user: UserSerializer = Depends(get_current_user)):
     """
         Endpoint onde é possivel buscar uma tarefa especifica pelo seu identificador "id".
+
+        A resposta tem os headers ETag e Last-Modified, enviando-os em "If-None-Match" ou "If-Modified-Since" a tarefa só é retornada novamente se tiver mudado, caso contrário a resposta é 304 sem corpo.
     """
 
-    return get_task_or_404(session=session, task=Task, id=id)
+    task_row = await run_in_session(session, crud.read_task, id, current_user.id)
+    etag = make_task_etag(task_row)
+    last_modified = get_last_modified(task_row.data_atualizacao)
+    return not_modified_response(request, etag, last_modified) or RawJSONResponse(dump_task(task_row), headers=get_cache_headers(etag, last_modified))
 
 
 @app.get("/api/tasks/list/{pagina}", responses=responses.list_tasks)
-def list_tasks(session: SessionDep, pagina: int = Path(..., title="Pagina", description="Este valor é usado para paginar as tarefas"), estado: str | None = Query(None, description=f"Usado para filtrar tarefas pelo seu estado, onde há somente 3 possiveis valores: {ALLOWED_STATE_FILTER}, caso este filtro seja enviado com valor incorreto, será gerado uma excessão."), current_user: UserSerializer = Depends(get_current_user)):
+async def list_tasks(request: Request, session: DatabaseReadSessionDep, pagina: int = Path(..., title="Pagina", description="Este valor é usado para paginar as tarefas"), tamanho: int = Query(PAGINATION_PER_PAGE, ge=1, le=PAGINATION_MAX_PER_PAGE, description="Quantidade de tarefas por pagina."), filters: TaskFilters = Depends(get_task_filters), fields: str | None = Query(None, description=f"Campos retornados em cada tarefa, separados por virgula (ex: \"id,titulo,estado\"), possiveis campos: {TASK_FIELDS}. O \"id\" é sempre retornado, caso não seja enviado, todos os campos serão retornados."), current_user: UserSerializer = Depends(get_current_user)):
     """
-        Endpoist para listar tarefas, cada pagina acessa 10 tarefas de cada vez (podendo mudar dependendo da configuração), caso não haja tarefas para uma pagina especifica, será retornado uma lista vazia ou com as tarefas restantes.
+        Endpoist para listar tarefas, cada pagina acessa 10 tarefas de cada vez (podendo mudar com o parametro "tamanho" ou com a configuração), caso não haja tarefas para uma pagina especifica, será retornado uma lista vazia ou com as tarefas restantes.
+
+        Para paginas muito profundas prefira o endpoint de listagem por cursor, que não precisa descartar as tarefas das paginas anteriores.
+
+        Aceita os mesmos filtros e ordenações do endpoint de listagem por cursor.
+
+        Assim como as demais listagens, a resposta tem o header ETag e, com o mesmo valor em "If-None-Match", é respondido 304 sem corpo enquanto a pagina não mudar.
     """
-    cache_key = pagina if not estado else f"{pagina}-{estado}"
-    if cache_key in cache:
-        return cache[cache_key]
-    if estado:
-        if not estado in ALLOWED_STATE_FILTER:
-            raise HTTPException(status_code=400, detail=f"Possiveis filtros de estado: {
-                                ALLOWED_STATE_FILTER}")
-        query = select(Task).where(Task.estado == estado)
-    else:
-        query = select(Task)
-    paginated_query = get_paginated_tasks(page=pagina, select_query=query)
-    tasks = session.exec(paginated_query).all()
+    fields = parse_fields(fields)
+    cache_key = (pagina, tamanho, filters, fields)
+    cached_tasks = cache.get(cache_key, current_user.id)
+    if cached_tasks is not None:
+        return conditional_json_response(request, cached_tasks)
 
-    cache[cache_key] = tasks
-    return tasks
+    generation = cache.generation
+    tasks = dump_tasks(await run_in_session(session, crud.list_tasks, current_user.id, pagina, tamanho, filters, fields), fields)
+
+    cache.set(cache_key, tasks, generation,
+              get_replication_lag(session), current_user.id)
+    return conditional_json_response(request, tasks)
 
 
 @app.patch("/api/tasks/{id}", response_model=TaskSerializer, responses=responses.update_tasks)
-def update_tasks(task: TaskUpdate, session: SessionDep, id: int = Path(..., title="ID", description="Este valor é usado identificar uma tarefa"), current_user: UserSerializer = Depends(get_current_user)):
+async def update_tasks(task: TaskUpdate, session: DatabaseSessionDep, id: int = Path(..., title="ID", description="Este valor é usado identificar uma tarefa"), current_user: UserSerializer = Depends(get_current_user)):
     """
         Este endpoint é usado para atualizar campos de uma tarefa.
 
@@ -113,18 +325,12 @@ def update_tasks(task: TaskUpdate, session: SessionDep, id: int = Path(..., titl
     if task.estado and not task.is_state_valid(raise_error=True):
         pass
 
-    task_data = get_task_or_404(session=session, task=Task, id=id)
-    task_serializer = task.model_dump(exclude_unset=True)
-    task_data.sqlmodel_update(task_serializer)
-
-    session.add(task_data)
-    session.commit()
-    session.refresh(task_data)
-    return task_data
+    task_data = await run_in_session(session, crud.update_task, id, task, current_user.id)
+    return RawJSONResponse(dump_task(task_to_row(task_data)))
 
 
 @app.post("/api/tasks", response_model=TaskSerializer, responses=responses.create_tasks)
-def create_tasks(session: SessionDep, task_create: TaskCreate, current_user: UserSerializer = Depends(get_current_user)):
+async def create_tasks(session: DatabaseSessionDep, task_create: TaskCreate, current_user: UserSerializer = Depends(get_current_user)):
     """
         Este endpoint é usado para criar uma nova tarefa.
 
@@ -139,20 +345,37 @@ def create_tasks(session: SessionDep, task_create: TaskCreate, current_user: Use
         raise HTTPException(
             status_code=400, detail=task_create.validation_error_message)
 
-    session.add(new_task)
-    session.commit()
-    session.refresh(new_task)
-    return new_task
+    new_task.owner_id = current_user.id
+    new_task = await run_in_session(session, crud.create_task, new_task)
+    return RawJSONResponse(dump_task(task_to_row(new_task)))
 
 
 @app.delete("/api/tasks/{id}", responses=responses.delete_tasks)
-def delete_tasks(session: SessionDep, id: int = Path(..., title="ID", description="Este valor é usado para identificar uma tarefa"), current_user: UserSerializer = Depends(get_current_user)):
+async def delete_tasks(session: DatabaseSessionDep, id: int = Path(..., title="ID", description="Este valor é usado para identificar uma tarefa"), current_user: UserSerializer = Depends(get_current_user)):
     """
         Este endpoint é usado para excluir uma tarefa especifica.
     """
 
-    task = get_task_or_404(session=session, task=Task, id=id)
-
-    session.delete(task)
-    session.commit()
+    await run_in_session(session, crud.delete_task, id, current_user.id)
     return {"ok": True}
+
+
+@app.get("/api/database/pool", responses=responses.database_pool)
+async def database_pool(current_user: UserSerializer = Depends(get_current_user)):
+    """
+        Este endpoint retorna o estado dos pools de conexão (conexões em uso, livres e em overflow)
+        e as metricas de checkout: tempo de espera por uma conexão, eventos de overflow e timeouts.
+    """
+
+    return get_pool_stats()
+
+
+@app.get("/metrics", response_class=PlainTextResponse, responses=responses.metrics)
+async def metrics():
+    """
+        Este endpoint é aberto e retorna as metricas no formato texto do Prometheus: requisições,
+        status e histogramas de latencia por rota, consultas ao banco por requisição, taxa de
+        acerto dos caches e uso dos pools de conexão.
+    """
+
+    return PlainTextResponse(metrics_registry.render(get_runtime_gauges()), media_type="text/plain; version=0.0.4")
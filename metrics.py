@@ -0,0 +1,209 @@
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from sqlalchemy import event
+from threading import Lock
+import time
+
+# Metricas no formato texto do Prometheus, sem dependencia externa: contagem e latencia das
+# requisições por rota, consultas ao banco feitas em cada requisição e acerto dos caches.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_COUNT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100)
+UNMATCHED_ROUTE = "<sem rota>"
+
+
+class RequestStats:
+    def __init__(self, scope: dict | None = None):
+        self.scope = scope
+        self.queries = 0
+        self.query_seconds = 0.0
+        self.spans = {}
+        self.endpoint_finished_at = None
+
+    def add_span(self, name: str, seconds: float):
+        self.spans[name] = self.spans.get(name, 0.0) + seconds
+
+
+# Estatisticas da requisição atual, o contexto é copiado para as threads do run_in_threadpool
+# e para o greenlet do run_sync, então as consultas são contadas nos dois modos de banco.
+current_request: ContextVar[RequestStats | None] = ContextVar(
+    "current_request", default=None)
+
+
+@contextmanager
+def span(name: str):
+    # Soma o tempo do bloco na etapa `name` da requisição atual, usado no perfil por requisição.
+    stats = current_request.get()
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        if stats is not None:
+            stats.add_span(name, time.perf_counter() - started_at)
+
+
+class Histogram:
+    def __init__(self, buckets: tuple):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = Lock()
+        self.requests = {}
+        self.latency = {}
+        self.queries = {}
+        self.query_seconds = {}
+        self.queries_per_request = {}
+        self.in_progress = 0
+
+    def start_request(self):
+        with self._lock:
+            self.in_progress += 1
+
+    def finish_request(self, method: str, route: str, status: int, elapsed: float, stats: RequestStats):
+        with self._lock:
+            self.in_progress -= 1
+            key = (method, route, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self.latency.setdefault(
+                (method, route), Histogram(LATENCY_BUCKETS)).observe(elapsed)
+            self.queries[route] = self.queries.get(route, 0) + stats.queries
+            self.query_seconds[route] = self.query_seconds.get(
+                route, 0.0) + stats.query_seconds
+            self.queries_per_request.setdefault(
+                route, Histogram(QUERY_COUNT_BUCKETS)).observe(stats.queries)
+
+    def clear(self):
+        with self._lock:
+            self.requests.clear()
+            self.latency.clear()
+            self.queries.clear()
+            self.query_seconds.clear()
+            self.queries_per_request.clear()
+
+    def render(self, gauges: dict[str, tuple[str, dict[tuple, float]]]):
+        """
+            Gera o texto no formato de exposição do Prometheus, `gauges` recebe valores calculados
+            no momento da coleta (caches e pools), no formato {nome: (ajuda, {labels: valor})}.
+        """
+        lines = []
+        with self._lock:
+            write_metric(lines, "http_requests_total", "counter", "Requisições por rota, metodo e status.",
+                         {labels(method=method, route=route, status=status): value for (method, route, status), value in self.requests.items()})
+            write_metric(lines, "http_requests_in_progress", "gauge", "Requisições em andamento.",
+                         {"": self.in_progress})
+            write_histograms(lines, "http_request_duration_seconds", "Latencia das requisições por rota.",
+                             {(("method", method), ("route", route)): histogram for (method, route), histogram in self.latency.items()})
+            write_metric(lines, "db_queries_total", "counter", "Consultas ao banco por rota.",
+                         {labels(route=route): value for route, value in self.queries.items()})
+            write_metric(lines, "db_query_duration_seconds_total", "counter", "Tempo gasto em consultas ao banco por rota.",
+                         {labels(route=route): value for route, value in self.query_seconds.items()})
+            write_histograms(lines, "db_queries_per_request", "Consultas ao banco feitas em cada requisição.",
+                             {(("route", route),): histogram for route, histogram in self.queries_per_request.items()})
+        for name, (help_text, values) in gauges.items():
+            write_metric(lines, name, "gauge", help_text, values)
+        return "\n".join(lines) + "\n"
+
+
+def escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def labels(**values) -> str:
+    return ",".join(f'{name}="{escape_label(value)}"' for name, value in values.items())
+
+
+def format_value(value: float) -> str:
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def write_metric(lines: list, name: str, kind: str, help_text: str, values: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} {kind}")
+    for label_text, value in values.items():
+        label_part = "{" + label_text + "}" if label_text else ""
+        lines.append(f"{name}{label_part} {format_value(value)}")
+
+
+def write_histograms(lines: list, name: str, help_text: str, histograms: dict):
+    lines.append(f"# HELP {name} {help_text}")
+    lines.append(f"# TYPE {name} histogram")
+    for label_pairs, histogram in histograms.items():
+        base = labels(**dict(label_pairs))
+        cumulative = 0
+        for bucket, bucket_count in zip(histogram.buckets + ("+Inf",), histogram.counts):
+            cumulative += bucket_count
+            le = labels(le=bucket)
+            lines.append(f"{name}_bucket{{{base},{le}}} {cumulative}")
+        lines.append(f"{name}_sum{{{base}}} {format_value(histogram.sum)}")
+        lines.append(f"{name}_count{{{base}}} {histogram.count}")
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.query_started_at = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    stats = current_request.get()
+    if stats is not None:
+        stats.queries += 1
+        stats.query_seconds += time.perf_counter() - context.query_started_at
+
+
+def instrument_engine(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    return sync_engine
+
+
+def get_route_template(scope: dict) -> str:
+    # O FastAPI grava a rota encontrada no scope, usar o template evita uma serie por id.
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """
+        Middleware ASGI que mede cada requisição HTTP, incluindo o envio completo das respostas
+        em streaming, e agrega as metricas pelo template da rota.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        stats = RequestStats(scope)
+        token = current_request.set(stats)
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        self.registry.start_request()
+        started_at = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            self.registry.finish_request(scope["method"], get_route_template(scope), status,
+                                         time.perf_counter() - started_at, stats)
+            current_request.reset(token)
+
+
+metrics_registry = MetricsRegistry()
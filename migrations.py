@@ -0,0 +1,77 @@
+from sqlalchemy import Engine, Index, inspect, text
+from sqlalchemy.schema import CreateColumn, DropIndex
+from sqlmodel import SQLModel
+from search import create_search_index
+from settings import MIGRATION_OWNER_ID
+import logging
+
+logger = logging.getLogger("migrations")
+
+# Indices substituidos pelos indices que começam pelo dono, somente estes são removidos, os
+# demais indices do banco (inclusive os criados manualmente) são mantidos.
+LEGACY_INDEXES = {
+    "task": ("ix_task_estado_id", "ix_task_data_criacao_id", "ix_task_data_atualizacao_id"),
+}
+
+
+def assign_task_owner(connection, owner_id: int | None):
+    """
+        Tarefas anteriores à coluna owner_id ficam sem dono, recebem o usuário informado em
+        MIGRATION_OWNER_ID. Sem ele é registrado um aviso com a quantidade de tarefas sem dono.
+    """
+    if owner_id is not None:
+        connection.execute(text("UPDATE task SET owner_id = :owner_id WHERE owner_id IS NULL"),
+                           {"owner_id": owner_id})
+        return
+
+    orphans = connection.execute(
+        text("SELECT COUNT(*) FROM task WHERE owner_id IS NULL")).scalar()
+    if orphans:
+        logger.warning(
+            "%s tarefas sem dono não aparecem para nenhum usuário, defina MIGRATION_OWNER_ID "
+            "com o id do usuário que deve recebê-las e reinicie a aplicação.", orphans)
+
+
+def run_migrations(engine: Engine, owner_id: int | None = MIGRATION_OWNER_ID):
+    """
+        Migração leve do schema para bancos que já existiam antes de uma mudança nos models.
+
+        O `create_all` só cria tabelas que ainda não existem, então colunas e indices novos
+        de tabelas existentes são criados aqui, sem precisar recriar o banco. Indices antigos
+        listados em LEGACY_INDEXES são removidos, para não custarem nas escritas.
+        Tarefas sem dono recebem `owner_id` (MIGRATION_OWNER_ID) e por fim é criado o indice
+        da busca textual, que depende do banco usado.
+    """
+    with engine.begin() as connection:
+        inspector = inspect(connection)
+        for table in SQLModel.metadata.sorted_tables:
+            if not inspector.has_table(table.name):
+                continue
+
+            existing_columns = {column["name"]
+                                for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                if not column.nullable and column.server_default is None:
+                    raise RuntimeError(
+                        f"Coluna obrigatória {table.name}.{column.name} não pode ser adicionada automaticamente.")
+                column_ddl = CreateColumn(column).compile(dialect=engine.dialect)
+                connection.exec_driver_sql(
+                    f"ALTER TABLE {table.name} ADD COLUMN {column_ddl}")
+
+            legacy_indexes = LEGACY_INDEXES.get(table.name, ())
+            existing_indexes = inspector.get_indexes(table.name)
+            for index in existing_indexes:
+                if index["name"] in legacy_indexes:
+                    # Index sem colunas para não ser associado à tabela dos models.
+                    connection.execute(DropIndex(Index(index["name"])))
+
+            existing_names = {index["name"] for index in existing_indexes}
+            for index in table.indexes:
+                if index.name not in existing_names:
+                    index.create(connection)
+
+        if inspector.has_table("task"):
+            assign_task_owner(connection, owner_id)
+        create_search_index(connection)
@@ -1,8 +1,11 @@
 
 from enum import Enum
 from datetime import datetime
+from typing import Any
 from fastapi import HTTPException
+from sqlalchemy import Index
 from sqlmodel import Field, SQLModel
+from models.user import User
 from utils import BaseModelSerializer, get_utc_now
 
 
@@ -44,8 +47,28 @@ class PossiveisEstados(str, Enum):
     andamento = "em andamento"
 
 
+# Estado guardado no banco para cada valor aceito no filtro de estado.
+STATE_FILTERS = {
+    "pendente": PossiveisEstados.pendente,
+    "andamento": PossiveisEstados.andamento,
+    "concluida": PossiveisEstados.concluido,
+}
+
+
 class Task(SQLModel, table=True):
+    # Toda consulta é feita dentro das tarefas de um usuário, então os indices começam pelo dono
+    # e terminam em "id", permitindo filtrar/ordenar e paginar pelo mesmo indice.
+    __table_args__ = (
+        Index("ix_task_owner_id_id", "owner_id", "id"),
+        Index("ix_task_owner_estado_id", "owner_id", "estado", "id"),
+        Index("ix_task_owner_data_criacao_id",
+              "owner_id", "data_criacao", "id"),
+        Index("ix_task_owner_data_atualizacao_id",
+              "owner_id", "data_atualizacao", "id"),
+    )
+
     id: int | None = Field(default=None, primary_key=True)
+    owner_id: int | None = Field(default=None, foreign_key=f"{User.__tablename__}.id")
 
     titulo: str
     descricao: str | None = None
@@ -64,6 +87,16 @@ class TaskSerializer(BaseModelSerializer):
     data_atualizacao: datetime
 
 
+class TaskCursorPage(BaseModelSerializer):
+    tarefas: list[TaskSerializer]
+    proximo_cursor: str | None
+
+
+class TaskSummary(BaseModelSerializer):
+    total: int
+    estados: dict[str, int]
+
+
 class TaskUpdate(BaseModelSerializer, TaskStateValidation):
     titulo: str | None = None
     descricao: str | None = None
@@ -74,3 +107,26 @@ class TaskCreate(BaseModelSerializer, TaskStateValidation):
     titulo: str
     descricao: str | None = None
     estado: str
+
+
+class TaskBulkUpdate(TaskUpdate):
+    id: int
+
+
+class TaskBulkDelete(BaseModelSerializer):
+    ids: list[int]
+
+
+class TaskBulkError(BaseModelSerializer):
+    indice: int
+    detail: Any
+
+
+class TaskBulkResult(BaseModelSerializer):
+    tarefas: list[TaskSerializer]
+    erros: list[TaskBulkError]
+
+
+class TaskBulkDeleteResult(BaseModelSerializer):
+    ids: list[int]
+    erros: list[TaskBulkError]
@@ -0,0 +1,125 @@
+from cProfile import Profile
+from fastapi.concurrency import run_in_threadpool
+from fastapi.routing import APIRoute
+from functools import wraps
+from metrics import current_request, get_route_template
+from settings import PROFILING_DIR, PROFILING_ENABLED, PROFILING_SAMPLE_RATE
+from threading import Lock
+from datetime import datetime
+import asyncio
+import random
+import time
+
+# Perfil opcional por requisição: as etapas (auth, sessao, consulta, bcrypt, endpoint e
+# serializacao) vão no header Server-Timing, e o cProfile é salvo em PROFILING_DIR em formato
+# pstats (compativel com snakeviz, flameprof, gprof2dot, ...).
+
+PROFILE_HEADER = b"x-profile"
+
+# Só um cProfile pode estar ativo por vez, requisições simultaneas recebem apenas o Server-Timing.
+profiler_lock = Lock()
+
+
+class ProfiledRoute(APIRoute):
+    """
+        Rota que registra o tempo do endpoint e da serialização da resposta, que acontece
+        depois do endpoint retornar (validação do response_model e geração do JSON).
+    """
+
+    def get_route_handler(self):
+        endpoint = self.dependant.call
+        if asyncio.iscoroutinefunction(endpoint):
+            @wraps(endpoint)
+            async def timed_endpoint(*args, **kwargs):
+                stats = current_request.get()
+                started_at = time.perf_counter()
+                try:
+                    return await endpoint(*args, **kwargs)
+                finally:
+                    if stats is not None:
+                        stats.endpoint_finished_at = time.perf_counter()
+                        stats.add_span(
+                            "endpoint", stats.endpoint_finished_at - started_at)
+
+            self.dependant.call = timed_endpoint
+
+        handler = super().get_route_handler()
+
+        async def timed_handler(request):
+            response = await handler(request)
+            stats = current_request.get()
+            if stats is not None and stats.endpoint_finished_at is not None:
+                stats.add_span("serializacao", time.perf_counter() -
+                               stats.endpoint_finished_at)
+            return response
+
+        return timed_handler
+
+
+def should_profile(scope: dict):
+    if PROFILING_ENABLED and (PROFILE_HEADER, b"1") in scope["headers"]:
+        return True
+    return PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE
+
+
+def get_server_timing(total_seconds: float):
+    stats = current_request.get()
+    timings = dict(stats.spans) if stats is not None else {}
+    if stats is not None and stats.queries:
+        timings["consulta"] = stats.query_seconds
+    timings["total"] = total_seconds
+    return ", ".join(f"{name};dur={seconds * 1000:.3f}" for name, seconds in timings.items())
+
+
+def get_profile_name(scope: dict):
+    route = get_route_template(scope).strip("/").replace("/", "_")
+    route = "".join(char for char in route if char.isalnum() or char in "_-")
+    return f"{datetime.now():%Y%m%d-%H%M%S-%f}-{scope['method']}-{route or 'raiz'}.prof"
+
+
+class ProfilingMiddleware:
+    """
+        Middleware ASGI que ativa o perfil nas requisições escolhidas pelo header "X-Profile: 1"
+        (quando PROFILING_ENABLED) ou por amostragem (PROFILING_SAMPLE_RATE).
+
+        O cProfile mede a thread do event loop, então o trabalho feito no pool de threads aparece
+        somente como espera, e requisições concorrentes no mesmo worker entram no mesmo perfil.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not should_profile(scope):
+            return await self.app(scope, receive, send)
+
+        profiler = Profile() if profiler_lock.acquire(blocking=False) else None
+        profile_name = None
+        started_at = time.perf_counter()
+
+        async def send_with_timing(message):
+            nonlocal profile_name
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", get_server_timing(
+                    time.perf_counter() - started_at).encode()))
+                if profiler is not None:
+                    profile_name = get_profile_name(scope)
+                    headers.append((b"x-profile-file", profile_name.encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        if profiler is None:
+            return await self.app(scope, receive, send_with_timing)
+
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, send_with_timing)
+            finally:
+                profiler.disable()
+            if profile_name:
+                PROFILING_DIR.mkdir(parents=True, exist_ok=True)
+                await run_in_threadpool(profiler.dump_stats, PROFILING_DIR / profile_name)
+        finally:
+            profiler_lock.release()
@@ -0,0 +1,124 @@
+from fastapi import HTTPException
+from sqlalchemy import column, func, inspect, literal_column, select, table
+import re
+
+# Busca textual em titulo e descricao usando o indice de texto do proprio banco: no SQLite uma
+# tabela virtual FTS5 com o conteudo da tabela "task" (mantida pelos triggers abaixo) e no
+# Postgres uma coluna tsvector gerada com um indice GIN. O termo vira uma busca por prefixo de
+# cada palavra, todas obrigatórias, e os resultados são ordenados pela relevancia.
+#
+# A busca já começa nas tarefas do dono (no FTS5 o owner_id é um token indexado da tabela
+# virtual, que também guarda os prefixos de 1 a 3 letras) e somente as SEARCH_MAX_CANDIDATES
+# tarefas mais recentes que combinam com o termo são ordenadas pela relevancia, assim palavras
+# muito comuns não obrigam o banco a calcular o ranking de todas as tarefas que as contêm.
+
+SEARCH_TABLE = "task_fts"
+SEARCH_COLUMN = "busca"
+SEARCH_LANGUAGE = "portuguese"
+# Peso do titulo, da descricao e do dono no ranking do SQLite (bm25), o titulo vale mais e o
+# dono, que está em todas as tarefas encontradas, não conta.
+SEARCH_WEIGHTS = (10.0, 1.0, 0.0)
+SEARCH_MAX_TERMS = 10
+SEARCH_MAX_CANDIDATES = 1000
+
+SQLITE_SEARCH_DDL = (
+    f"""CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5(
+        titulo, descricao, owner_id, content='task', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')""",
+    f"INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}) VALUES('rebuild')",
+)
+
+SQLITE_SEARCH_TRIGGERS = (
+    f"""CREATE TRIGGER IF NOT EXISTS task_fts_insert AFTER INSERT ON task BEGIN
+        INSERT INTO {SEARCH_TABLE}(rowid, titulo, descricao, owner_id) VALUES (new.id, new.titulo, new.descricao, new.owner_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_fts_delete AFTER DELETE ON task BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, titulo, descricao, owner_id) VALUES ('delete', old.id, old.titulo, old.descricao, old.owner_id);
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS task_fts_update AFTER UPDATE OF titulo, descricao, owner_id ON task BEGIN
+        INSERT INTO {SEARCH_TABLE}({SEARCH_TABLE}, rowid, titulo, descricao, owner_id) VALUES ('delete', old.id, old.titulo, old.descricao, old.owner_id);
+        INSERT INTO {SEARCH_TABLE}(rowid, titulo, descricao, owner_id) VALUES (new.id, new.titulo, new.descricao, new.owner_id);
+    END""",
+)
+
+# Uma tabela virtual criada por uma versão anterior (sem o owner_id ou sem os indices de
+# prefixo) é recriada junto com os triggers.
+SQLITE_SEARCH_DROP = (
+    "DROP TRIGGER IF EXISTS task_fts_insert",
+    "DROP TRIGGER IF EXISTS task_fts_delete",
+    "DROP TRIGGER IF EXISTS task_fts_update",
+    f"DROP TABLE IF EXISTS {SEARCH_TABLE}",
+)
+
+POSTGRES_SEARCH_DDL = (
+    f"""ALTER TABLE task ADD COLUMN IF NOT EXISTS {SEARCH_COLUMN} tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(titulo, '')), 'A') ||
+        setweight(to_tsvector('{SEARCH_LANGUAGE}', coalesce(descricao, '')), 'B')) STORED""",
+    f"CREATE INDEX IF NOT EXISTS task_{SEARCH_COLUMN}_gin ON task USING GIN ({SEARCH_COLUMN})",
+)
+
+search_table = table(SEARCH_TABLE, column("rowid"))
+
+
+def create_search_index(connection):
+    """
+        Cria as estruturas da busca textual caso ainda não existam, as tarefas que já estavam
+        no banco são indexadas na criação.
+    """
+    inspector = inspect(connection)
+    if not inspector.has_table("task"):
+        # Sem a tabela de tarefas (models ainda não importados) não há o que indexar.
+        return
+
+    dialect = connection.dialect.name
+    if dialect == "sqlite":
+        current_ddl = connection.exec_driver_sql(
+            "SELECT sql FROM sqlite_master WHERE name = ?", (SEARCH_TABLE,)).scalar()
+        if current_ddl != SQLITE_SEARCH_DDL[0]:
+            for statement in SQLITE_SEARCH_DROP + SQLITE_SEARCH_DDL:
+                connection.exec_driver_sql(statement)
+        for statement in SQLITE_SEARCH_TRIGGERS:
+            connection.exec_driver_sql(statement)
+    elif dialect == "postgresql":
+        for statement in POSTGRES_SEARCH_DDL:
+            connection.exec_driver_sql(statement)
+
+
+def parse_search_terms(termo: str):
+    # Somente as palavras do termo são usadas, então a sintaxe de busca do banco não é exposta.
+    terms = re.findall(r"\w+", termo.lower())[:SEARCH_MAX_TERMS]
+    if not terms:
+        raise HTTPException(
+            status_code=400, detail="Informe pelo menos uma palavra para a busca.")
+    return tuple(terms)
+
+
+def get_search_query(select_query, id_column, owner_id: int, dialect: str, terms: tuple[str, ...]):
+    """
+        Junta em `select_query` as tarefas do dono que combinam com os termos, ordenadas pela
+        relevancia. A relevancia só é calculada para as SEARCH_MAX_CANDIDATES tarefas mais
+        recentes encontradas.
+    """
+    if dialect == "sqlite":
+        # Os termos são buscados somente no titulo e na descricao, o dono é um filtro do indice.
+        words = " ".join(f'"{term}"*' for term in terms)
+        match = f'owner_id:"{int(owner_id)}" AND {{titulo descricao}}:({words})'
+        fts = literal_column(SEARCH_TABLE)
+        candidates = select(search_table.c.rowid, func.bm25(fts, *SEARCH_WEIGHTS).label("rank")).where(
+            fts.op("MATCH")(match)).order_by(search_table.c.rowid.desc()).limit(SEARCH_MAX_CANDIDATES).subquery()
+        return select_query.join(candidates, candidates.c.rowid == id_column).order_by(
+            candidates.c.rank, id_column)
+
+    if dialect == "postgresql":
+        language = literal_column(f"'{SEARCH_LANGUAGE}'::regconfig")
+        query = func.to_tsquery(
+            language, " & ".join(f"{term}:*" for term in terms))
+        document = literal_column(f"task.{SEARCH_COLUMN}")
+        candidates = select(id_column.label("id"), func.ts_rank(document, query).label("rank")).where(
+            literal_column("task.owner_id") == owner_id, document.op("@@")(query)).order_by(
+            id_column.desc()).limit(SEARCH_MAX_CANDIDATES).subquery()
+        return select_query.join(candidates, candidates.c.id == id_column).order_by(
+            candidates.c.rank.desc(), id_column)
+
+    raise HTTPException(
+        status_code=501, detail="Busca não disponivel para este banco de dados.")
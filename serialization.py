@@ -0,0 +1,70 @@
+from fastapi import HTTPException
+from fastapi.responses import Response
+from metrics import span
+from models.task import Task
+import orjson
+
+# Serialização rapida das tarefas: as listagens leem somente as colunas (tuplas, sem criar
+# instancias do ORM) e geram o JSON direto com orjson, sem passar pelo jsonable_encoder nem
+# pela validação do response_model. O corpo pronto (bytes) é o que fica guardado no cache.
+# Como o JSON é gerado dentro do endpoint, cada dump_* registra a etapa "serializacao" do perfil.
+
+TASK_COLUMNS = (Task.id, Task.titulo, Task.descricao,
+                Task.estado, Task.data_criacao, Task.data_atualizacao)
+TASK_FIELDS = tuple(column.key for column in TASK_COLUMNS)
+TASK_COLUMNS_BY_FIELD = dict(zip(TASK_FIELDS, TASK_COLUMNS))
+
+
+class RawJSONResponse(Response):
+    media_type = "application/json"
+
+
+def parse_fields(fields: str | None):
+    """
+        Converte o parametro "fields" (campos separados por virgula) nos campos projetados na
+        consulta, na ordem de TASK_FIELDS. O "id" é sempre incluido, pois identifica a tarefa
+        e é usado no cursor da proxima pagina.
+    """
+    if not fields:
+        return TASK_FIELDS
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    invalid = requested.difference(TASK_FIELDS)
+    if invalid:
+        raise HTTPException(
+            status_code=400, detail=f"Campos invalidos: {sorted(invalid)}, possiveis campos: {TASK_FIELDS}")
+    requested.add("id")
+    return tuple(field for field in TASK_FIELDS if field in requested)
+
+
+def get_task_columns(fields: tuple[str, ...] = TASK_FIELDS):
+    return tuple(TASK_COLUMNS_BY_FIELD[field] for field in fields)
+
+
+def row_to_dict(row, fields: tuple[str, ...] = TASK_FIELDS):
+    # O orjson serializa o Enum do estado pelo seu valor e as datas em ISO 8601.
+    return dict(zip(fields, row))
+
+
+def task_to_row(task: Task):
+    return tuple(getattr(task, field) for field in TASK_FIELDS)
+
+
+def dump_task(row) -> bytes:
+    with span("serializacao"):
+        return orjson.dumps(row_to_dict(row))
+
+
+def dump_tasks(rows, fields: tuple[str, ...] = TASK_FIELDS) -> bytes:
+    with span("serializacao"):
+        return orjson.dumps([row_to_dict(row, fields) for row in rows])
+
+
+def dump_task_page(rows, next_cursor: str | None, fields: tuple[str, ...] = TASK_FIELDS) -> bytes:
+    with span("serializacao"):
+        return orjson.dumps({"tarefas": [row_to_dict(row, fields) for row in rows], "proximo_cursor": next_cursor})
+
+
+def dump_summary(summary: dict) -> bytes:
+    with span("serializacao"):
+        return orjson.dumps(summary)
@@ -1,8 +1,88 @@
 from secrets import token_hex
 from datetime import timedelta
+from dotenv import load_dotenv
+from pathlib import Path
+import os
 
-PAGINATION_PER_PAGE = 10
+BASE_DIR = Path(__file__).resolve().parent
+load_dotenv(BASE_DIR / ".env")
 
-JWT_SECRET_KEY = token_hex(32)
+USE_DATABASE_TEST = int(os.environ.get("USE_DATABASE_TEST", 0))
+if USE_DATABASE_TEST:
+    DATABASE_URL = os.environ.get(
+        "TEST_DATABASE_URL", "sqlite:///sqlite3_test.db")
+else:
+    DATABASE_URL = os.environ.get("DATABASE_URL", "sqlite:///sqlite3.db")
+
+# Quando ativo, os endpoints usam o engine assincrono (aiosqlite/asyncpg) em vez do pool de threads.
+USE_ASYNC_DATABASE = int(os.environ.get("USE_ASYNC_DATABASE", 0))
+ASYNC_DATABASE_URL = os.environ.get("ASYNC_DATABASE_URL")
+
+# Pool de conexões (somente para bancos que usam QueuePool, como Postgres e arquivos SQLite).
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 5))
+DB_MAX_OVERFLOW = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+DB_POOL_TIMEOUT = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+DB_POOL_RECYCLE = int(os.environ.get("DB_POOL_RECYCLE", -1))
+DB_POOL_PRE_PING = bool(int(os.environ.get("DB_POOL_PRE_PING", 0)))
+
+# Replicas de leitura separadas por virgula, usadas pelas leituras de tarefas. Depois de uma escrita
+# o cliente continua lendo do primario por READ_YOUR_WRITES_SECONDS segundos.
+DATABASE_REPLICA_URLS = [url.strip() for url in os.environ.get(
+    "DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+READ_YOUR_WRITES_SECONDS = float(os.environ.get("READ_YOUR_WRITES_SECONDS", 5))
+
+# PRAGMAs aplicados em cada conexão SQLite, deixe vazio para manter o padrão do SQLite.
+SQLITE_JOURNAL_MODE = os.environ.get("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")
+SQLITE_BUSY_TIMEOUT = os.environ.get("SQLITE_BUSY_TIMEOUT", "5000")
+SQLITE_MMAP_SIZE = os.environ.get("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))
+SQLITE_CACHE_SIZE = os.environ.get("SQLITE_CACHE_SIZE", "-64000")
+
+PAGINATION_PER_PAGE = int(os.environ.get("PAGINATION_PER_PAGE", 10))
+PAGINATION_MAX_PER_PAGE = int(os.environ.get("PAGINATION_MAX_PER_PAGE", 100))
+# Combinações de filtros e ordenação que nenhum indice resolve sozinho só são aceitas para
+# usuários com até esta quantidade de tarefas.
+LIST_FILTER_SCAN_MAX_TASKS = int(
+    os.environ.get("LIST_FILTER_SCAN_MAX_TASKS", 10000))
+
+BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", 1000))
+EXPORT_BATCH_SIZE = int(os.environ.get("EXPORT_BATCH_SIZE", 1000))
+IMPORT_BATCH_SIZE = int(os.environ.get("IMPORT_BATCH_SIZE", 1000))
+IMPORT_MAX_ERRORS = int(os.environ.get("IMPORT_MAX_ERRORS", 100))
+
+# Custo do bcrypt e pool de processos usado para gerar/verificar senhas.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12))
+HASHING_WORKERS = int(os.environ.get("HASHING_WORKERS", os.cpu_count() or 1))
+HASHING_MAX_PENDING = int(os.environ.get(
+    "HASHING_MAX_PENDING", HASHING_WORKERS * 8 or 8))
+
+# Dono atribuido pela migração às tarefas criadas antes da coluna owner_id existir, sem ele
+# essas tarefas ficam sem dono e não aparecem para nenhum usuário.
+MIGRATION_OWNER_ID = int(os.environ["MIGRATION_OWNER_ID"]) if os.environ.get(
+    "MIGRATION_OWNER_ID") else None
+
+# Com varios processos (uvicorn --workers) todos precisam da mesma chave, a chave aleatoria
+# gerada na falta da variavel só serve para um processo.
+JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY") or token_hex(32)
 JWT_HASH_ALGORITHM = "HS256"
 JWT_EXPIRATION_TIME = timedelta(hours=1)
+TOKEN_CACHE_MAXSIZE = int(os.environ.get("TOKEN_CACHE_MAXSIZE", 10000))
+USER_CACHE_MAXSIZE = int(os.environ.get("USER_CACHE_MAXSIZE", 10000))
+USER_CACHE_TTL = int(os.environ.get("USER_CACHE_TTL", 300))
+
+# Consultas mais lentas que SLOW_QUERY_THRESHOLD_MS são registradas no log "slow_queries" junto
+# com o plano de execução (EXPLAIN), um valor negativo desativa o log.
+SLOW_QUERY_THRESHOLD_MS = float(
+    os.environ.get("SLOW_QUERY_THRESHOLD_MS", 200))
+SLOW_QUERY_EXPLAIN = bool(int(os.environ.get("SLOW_QUERY_EXPLAIN", 1)))
+
+# Perfil por requisição: com PROFILING_ENABLED o header "X-Profile: 1" ativa o cProfile na
+# requisição, e PROFILING_SAMPLE_RATE (0 a 1) escolhe uma fração das requisições ao acaso.
+PROFILING_ENABLED = bool(int(os.environ.get("PROFILING_ENABLED", 0)))
+PROFILING_SAMPLE_RATE = float(os.environ.get("PROFILING_SAMPLE_RATE", 0))
+PROFILING_DIR = Path(os.environ.get("PROFILING_DIR", BASE_DIR / "profiles"))
+
+# O cache das listagens é de cada processo: uma escrita só invalida o cache do worker que a
+# recebeu, então com varios workers o TTL é o tempo maximo que os demais servem dados antigos.
+TASK_LIST_CACHE_MAXSIZE = int(os.environ.get("TASK_LIST_CACHE_MAXSIZE", 4096))
+TASK_LIST_CACHE_TTL = int(os.environ.get("TASK_LIST_CACHE_TTL", 60))
@@ -0,0 +1,84 @@
+from metrics import current_request, get_route_template
+from settings import SLOW_QUERY_EXPLAIN, SLOW_QUERY_THRESHOLD_MS
+from sqlalchemy import event
+import logging
+import time
+
+# Log das consultas lentas: a consulta, os parametros, o endpoint que a executou e o plano de
+# execução capturado na mesma conexão, para encontrar full scans e OFFSETs grandes em produção.
+
+logger = logging.getLogger("slow_queries")
+
+EXPLAIN_PREFIXES = {"sqlite": "EXPLAIN QUERY PLAN "}
+EXPLAINABLE_STATEMENTS = ("select", "with", "update", "delete", "insert")
+PARAMETER_MAX_LENGTH = 200
+EXPLAIN_SAVEPOINT = "slow_query_explain"
+
+
+def format_parameters(parameters):
+    # Textos longos (descrições, hashes de senha) são cortados para não inflar o log.
+    if isinstance(parameters, dict):
+        return {name: format_parameters(value) for name, value in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        return type(parameters)(format_parameters(value) for value in parameters)
+    if isinstance(parameters, str) and len(parameters) > PARAMETER_MAX_LENGTH:
+        return parameters[:PARAMETER_MAX_LENGTH] + "..."
+    return parameters
+
+
+def explain(conn, statement: str, parameters):
+    if not statement.lstrip().lower().startswith(EXPLAINABLE_STATEMENTS):
+        return None
+    prefix = EXPLAIN_PREFIXES.get(conn.dialect.name, "EXPLAIN ")
+    # Cursor cru da mesma conexão, o EXPLAIN não passa pelos eventos do engine (nem pelas metricas).
+    # Ele roda dentro de um savepoint, assim um EXPLAIN que falhe não aborta a transação da
+    # requisição (no Postgres qualquer erro invalida a transação inteira).
+    cursor = conn.connection.dbapi_connection.cursor()
+    try:
+        cursor.execute(f"SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        try:
+            cursor.execute(prefix + statement, parameters)
+            plan = "\n".join(" | ".join(str(column)
+                             for column in row) for row in cursor.fetchall())
+        except Exception as error:
+            cursor.execute(f"ROLLBACK TO SAVEPOINT {EXPLAIN_SAVEPOINT}")
+            plan = f"EXPLAIN falhou: {error}"
+        cursor.execute(f"RELEASE SAVEPOINT {EXPLAIN_SAVEPOINT}")
+        return plan
+    except Exception as error:
+        return f"EXPLAIN falhou: {error}"
+    finally:
+        cursor.close()
+
+
+def get_current_endpoint():
+    stats = current_request.get()
+    if stats is None or stats.scope is None:
+        return None
+    return f"{stats.scope['method']} {get_route_template(stats.scope)}"
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    context.slow_query_started_at = time.perf_counter()
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if SLOW_QUERY_THRESHOLD_MS < 0:
+        return
+    elapsed_ms = (time.perf_counter() - context.slow_query_started_at) * 1000
+    if elapsed_ms < SLOW_QUERY_THRESHOLD_MS:
+        return
+
+    # Em um executemany o plano é o mesmo para todos os conjuntos de parametros.
+    first_parameters = parameters[0] if executemany and parameters else parameters
+    plan = explain(conn, statement,
+                   first_parameters) if SLOW_QUERY_EXPLAIN else None
+    logger.warning("Consulta lenta (%.1f ms) em %s\n%s\nParametros: %r\nPlano:\n%s",
+                   elapsed_ms, get_current_endpoint() or "fora de requisição", statement,
+                   format_parameters(parameters), plan)
+
+
+def instrument_slow_queries(sync_engine):
+    event.listen(sync_engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(sync_engine, "after_cursor_execute", after_cursor_execute)
+    return sync_engine
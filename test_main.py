@@ -1,14 +1,42 @@
 
 from fastapi.testclient import TestClient
 import pytest
-from database import engine
-from sqlmodel import SQLModel
+import asyncio
+from fastapi import HTTPException
+from hashing import HashingExecutor, check_hashed_pwd
+from database import create_async_database_engine, create_database_engine, create_db_and_tables, engine, get_async_engine, get_database_read_session, get_database_session, instrument_pool_class, PoolMetrics
+import database
+from sqlmodel.ext.asyncio.session import AsyncSession
+from sqlmodel import Session, SQLModel, create_engine, select
+from sqlalchemy import inspect
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool
+from generate_tasks import seed_tasks
+from importer import iter_lines
+from migrations import run_migrations
+from search import create_search_index
+import search
 from main import app
 import os
 from main import cache
+from metrics import metrics_registry
+import profiling
+import slow_queries
+import serialization
+from serialization import TASK_FIELDS
+import crud
+from crud import get_filtered_task_query
+from filters import TaskFilters
+from cache import TaskListCache, TokenCache, token_cache, user_cache
+from utils import decode_user, encode_user
+import time
+from datetime import datetime
+import csv
+import io
+import json
 from pathlib import Path
-from models.task import ALLOWED_STATE_FILTER, ALLOWED_STATES, Task, TaskSerializer
-from settings import PAGINATION_PER_PAGE
+from models.task import ALLOWED_STATE_FILTER, ALLOWED_STATES, PossiveisEstados, Task, TaskSerializer, TaskUpdate
+from settings import PAGINATION_MAX_PER_PAGE, PAGINATION_PER_PAGE, USE_ASYNC_DATABASE
 
 
 fake_test_tasks = [
@@ -38,16 +66,23 @@ def clear_cache():
     cache.clear()
 
 
+def remove_test_db():
+    test_db = Path(__file__).resolve().parent / "sqlite3_test.db"
+    # Em WAL o SQLite também cria os arquivos "-wal" e "-shm" ao lado do banco.
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(f"{test_db}{suffix}")
+        except FileNotFoundError:
+            pass
+
+
 @pytest.fixture(scope="session", autouse=True)
 def create_and_delete_test_db():
-    try:
-        os.remove(Path(__file__).resolve().parent / "sqlite3_test.db")
-    except FileNotFoundError:
-        pass
-
-    SQLModel.metadata.create_all(engine)
+    remove_test_db()
+    create_db_and_tables()
     yield
-    os.remove(Path(__file__).resolve().parent / "sqlite3_test.db")
+    engine.dispose()
+    remove_test_db()
 
 
 client = TestClient(app)
@@ -573,3 +608,1056 @@ def test_delete_task_and_check_is_was_deleted():
 
     assert task_response.status_code == 404
     assert task_response.json()["detail"] == "Tarefa não encontrada."
+
+
+def test_list_cache_is_invalidated_after_update():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    client.get("/api/tasks/list/1", headers=headers)
+    client.patch("/api/tasks/2", json={"titulo": "Titulo em cache"},
+                 headers=headers)
+    task_response = client.get("/api/tasks/list/1", headers=headers)
+
+    tasks = {task["id"]: task for task in task_response.json()}
+    assert tasks[2]["titulo"] == "Titulo em cache"
+
+
+def test_list_cache_discards_results_from_old_generation():
+    list_cache = TaskListCache(maxsize=10, ttl=60)
+    generation = list_cache.generation
+    list_cache.invalidate()
+
+    assert not list_cache.set((1, None), [], generation)
+    assert list_cache.get((1, None)) is None
+    assert list_cache.set((1, None), [], list_cache.generation)
+    assert list_cache.get((1, None)) == []
+
+
+def test_list_cache_forgets_owner_invalidations_after_ttl(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    list_cache = TaskListCache(maxsize=10, ttl=60)
+    generation = list_cache.generation
+    for owner in range(100):
+        list_cache.invalidate(owner)
+    assert len(list_cache._owner_invalidations) == 100
+
+    now[0] += 61
+    list_cache.invalidate(100)
+    assert list(list_cache._owner_invalidations) == [100]
+    # Uma leitura iniciada antes das invalidações esquecidas continua sem ser guardada.
+    assert not list_cache.set((1, None), [], generation, owner=5)
+    assert list_cache.set((1, None), [], list_cache.generation, owner=5)
+    assert list_cache.get((1, None), owner=5) == []
+
+
+def test_list_tasks_with_custom_page_size():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+
+    task_response = client.get("/api/tasks/list/1?tamanho=5", headers={
+        "Authorization": f"Bearer {response_json["access_token"]}"
+    })
+
+    assert task_response.status_code == 200
+    assert len(task_response.json()) == 5
+
+
+def test_cursor_pagination_walks_every_task_once():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    all_tasks = client.get(
+        "/api/tasks/list/1?tamanho=100", headers=headers).json()
+
+    ids = []
+    cursor = None
+    while True:
+        params = {"tamanho": 7}
+        if cursor:
+            params["cursor"] = cursor
+        page_response = client.get(
+            "/api/tasks/list", params=params, headers=headers)
+        page = page_response.json()
+
+        assert page_response.status_code == 200
+        assert len(page["tarefas"]) <= 7
+        ids.extend(task["id"] for task in page["tarefas"])
+        cursor = page["proximo_cursor"]
+        if cursor is None:
+            break
+
+    assert ids == sorted(task["id"] for task in all_tasks)
+
+
+def test_cursor_pagination_with_invalid_cursor():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+
+    task_response = client.get("/api/tasks/list?cursor=invalido", headers={
+        "Authorization": f"Bearer {response_json["access_token"]}"
+    })
+
+    assert task_response.status_code == 400
+    assert task_response.json()["detail"] == "Cursor invalido."
+
+
+def test_migration_creates_missing_task_indexes():
+    old_engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(old_engine)
+    with old_engine.begin() as connection:
+        for index in Task.__table__.indexes:
+            connection.exec_driver_sql(f"DROP INDEX {index.name}")
+
+    run_migrations(old_engine)
+
+    index_names = {index["name"]
+                   for index in inspect(old_engine).get_indexes("task")}
+    assert {"ix_task_owner_id_id", "ix_task_owner_estado_id", "ix_task_owner_data_criacao_id",
+            "ix_task_owner_data_atualizacao_id"} <= index_names
+
+
+def test_state_filter_uses_index():
+    query = get_filtered_task_query(1, TaskFilters(
+        estados=(PossiveisEstados.pendente,))).order_by(Task.id)
+    statement = str(query.compile(
+        engine, compile_kwargs={"literal_binds": True}))
+
+    with engine.connect() as connection:
+        plan = connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}").all()
+
+    assert any("ix_task_owner_estado_id" in row[-1] for row in plan)
+
+
+def test_task_endpoints_with_async_session():
+    async def get_test_async_session():
+        async with AsyncSession(get_async_engine(), expire_on_commit=False) as session:
+            yield session
+
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    app.dependency_overrides[get_database_session] = get_test_async_session
+    app.dependency_overrides[get_database_read_session] = get_test_async_session
+    try:
+        with TestClient(app) as async_client:
+            create_response = async_client.post(
+                "/api/tasks", json=fake_test_tasks[1], headers=headers)
+            task_id = create_response.json()["id"]
+            read_response = async_client.get(
+                f"/api/tasks/{task_id}", headers=headers)
+            update_response = async_client.patch(
+                f"/api/tasks/{task_id}", json={"titulo": "Titulo assincrono"}, headers=headers)
+            list_response = async_client.get(
+                "/api/tasks/list?tamanho=100", headers=headers)
+            delete_response = async_client.delete(
+                f"/api/tasks/{task_id}", headers=headers)
+            login_response = async_client.post(
+                "/api/auth/token", data=fake_user)
+    finally:
+        app.dependency_overrides.clear()
+
+    assert create_response.status_code == 200
+    assert read_response.json()["titulo"] == fake_test_tasks[1]["titulo"]
+    assert update_response.json()["titulo"] == "Titulo assincrono"
+    assert task_id in [task["id"] for task in list_response.json()["tarefas"]]
+    assert delete_response.json() == {"ok": True}
+    assert "access_token" in login_response.json()
+
+
+def test_hashing_executor_rejects_when_saturated():
+    executor = HashingExecutor(workers=0, max_pending=1)
+
+    async def hash_while_saturated():
+        first_hash = asyncio.ensure_future(executor.hash("fake_password"))
+        await asyncio.sleep(0)
+        with pytest.raises(HTTPException) as error:
+            await executor.hash("fake_password")
+        return error.value, await first_hash
+
+    error, hashed_password = asyncio.run(hash_while_saturated())
+
+    assert error.status_code == 429
+    assert check_hashed_pwd("fake_password", hashed_password)
+    assert executor.pending == 0
+
+
+def test_verified_token_is_served_from_cache():
+    response = client.post("/api/auth/token", data=fake_user)
+    token = response.json()["access_token"]
+    token_cache.clear()
+
+    first_claims = decode_user(token)
+    second_claims = decode_user(token)
+
+    assert first_claims == second_claims
+    assert first_claims["sub"].isdigit()
+    assert token_cache.stats()["misses"] == 1
+    assert token_cache.stats()["hits"] == 1
+
+
+def test_token_cache_honors_expiration():
+    tokens = TokenCache(maxsize=10)
+    tokens.set("expirado", {"username": "fake", "exp": time.time() - 1})
+    tokens.set("valido", {"username": "fake", "exp": time.time() + 60})
+
+    assert tokens.get("expirado") is None
+    assert tokens.get("valido")["username"] == "fake"
+    assert tokens.stats() == {"hits": 1, "misses": 1, "size": 1}
+
+
+def test_bulk_create_tasks_reports_invalid_items():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    invalid_task = fake_test_tasks[0].copy()
+    invalid_task["estado"] = "pendentee"
+
+    task_response = client.post("/api/tasks/bulk", json=[fake_test_tasks[0], invalid_task, {"descricao": "sem titulo"}, fake_test_tasks[1]], headers={
+        "Authorization": f"Bearer {response_json["access_token"]}"
+    })
+    result = task_response.json()
+
+    assert task_response.status_code == 200
+    assert [task["titulo"] for task in result["tarefas"]] == [
+        fake_test_tasks[0]["titulo"], fake_test_tasks[1]["titulo"]]
+    assert all(task["id"] and task["data_criacao"]
+               for task in result["tarefas"])
+    assert [error["indice"] for error in result["erros"]] == [1, 2]
+
+
+def test_bulk_update_tasks():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    created = client.post("/api/tasks/bulk", json=fake_test_tasks,
+                          headers=headers).json()["tarefas"]
+    first_id, second_id = created[0]["id"], created[1]["id"]
+
+    task_response = client.patch("/api/tasks/bulk", json=[
+        {"id": first_id, "estado": "em andamento"},
+        {"id": second_id, "titulo": "Titulo em lote"},
+        {"id": 999999, "titulo": "não existe"},
+        {"id": first_id, "estado": "andamentoo"},
+    ], headers=headers)
+    result = task_response.json()
+    tasks = {task["id"]: task for task in result["tarefas"]}
+
+    assert task_response.status_code == 200
+    assert tasks[first_id]["estado"] == "em andamento"
+    assert tasks[first_id]["data_atualizacao"] > created[0]["data_atualizacao"]
+    assert tasks[second_id]["titulo"] == "Titulo em lote"
+    assert result["erros"] == [
+        {"indice": 2, "detail": "Tarefa não encontrada."},
+        {"indice": 3, "detail": {
+            "estado": f'Somente 3 valores possiveis: {ALLOWED_STATES}'}},
+    ]
+
+
+def test_bulk_update_rejects_null_required_fields():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    task_id = client.post("/api/tasks", json=fake_test_tasks[0],
+                          headers=headers).json()["id"]
+
+    task_response = client.patch("/api/tasks/bulk", json=[
+        {"id": task_id, "titulo": None},
+        {"id": task_id, "descricao": None, "titulo": "Aplicada"},
+        {"id": task_id, "estado": None},
+    ], headers=headers)
+    result = task_response.json()
+
+    assert task_response.status_code == 200
+    assert [task["titulo"] for task in result["tarefas"]] == ["Aplicada"]
+    assert result["erros"] == [
+        {"indice": 0, "detail": TaskUpdate.validation_error_message},
+        {"indice": 2, "detail": TaskUpdate.validation_error_message},
+    ]
+
+
+def test_bulk_delete_tasks():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    created = client.post("/api/tasks/bulk", json=fake_test_tasks,
+                          headers=headers).json()["tarefas"]
+    ids = [task["id"] for task in created]
+
+    delete_response = client.request(
+        "DELETE", "/api/tasks/bulk", json={"ids": ids + [999999]}, headers=headers)
+
+    assert delete_response.status_code == 200
+    assert delete_response.json() == {"ids": ids, "erros": [
+        {"indice": 2, "detail": "Tarefa não encontrada."}]}
+    for id in ids:
+        assert client.get(f"/api/tasks/{id}",
+                          headers=headers).status_code == 404
+
+
+def test_bulk_endpoints_limit_batch_size():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+
+    task_response = client.post("/api/tasks/bulk", json=[], headers={
+        "Authorization": f"Bearer {response_json["access_token"]}"
+    })
+
+    assert task_response.status_code == 400
+
+
+def test_export_tasks_as_ndjson():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    all_tasks = client.get(
+        "/api/tasks/list/1?tamanho=100", headers=headers).json()
+    export_response = client.get("/api/tasks/export", headers=headers)
+    exported = [json.loads(line)
+                for line in export_response.text.splitlines()]
+
+    assert export_response.status_code == 200
+    assert export_response.headers["content-type"] == "application/x-ndjson"
+    assert exported == all_tasks
+
+
+def test_export_tasks_as_csv_filtered_by_state():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+
+    export_response = client.get("/api/tasks/export?formato=csv&estado=pendente", headers={
+        "Authorization": f"Bearer {response_json["access_token"]}"
+    })
+    rows = list(csv.DictReader(io.StringIO(export_response.text)))
+
+    assert export_response.status_code == 200
+    assert export_response.headers["content-type"].startswith("text/csv")
+    assert rows
+    assert all(row["estado"] == "pendente" for row in rows)
+
+
+def test_import_tasks_from_ndjson_in_batches(monkeypatch):
+    monkeypatch.setattr("main.IMPORT_BATCH_SIZE", 2)
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    records = [
+        json.dumps({"titulo": "Importada 1", "estado": "pendente"}),
+        "",
+        json.dumps({"titulo": "Importada 2", "descricao": "linha 2",
+                   "estado": "em andamento"}),
+        "{json invalido",
+        json.dumps({"titulo": "Importada 3", "estado": "pendentee"}),
+        json.dumps({"titulo": "Importada 4", "estado": "concluída"}),
+    ]
+    import_response = client.post(
+        "/api/tasks/import", content="\n".join(records).encode(), headers=headers)
+    exported = client.get("/api/tasks/export", headers=headers).text
+
+    assert import_response.status_code == 200
+    assert import_response.json()["aceitas"] == 3
+    assert import_response.json()["rejeitadas"] == 2
+    assert [error["registro"]
+            for error in import_response.json()["erros"]] == [3, 4]
+    for titulo in ("Importada 1", "Importada 2", "Importada 4"):
+        assert titulo in exported
+
+
+def test_import_tasks_from_exported_csv():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    client.post("/api/tasks", json={"titulo": "Com \"aspas\"", "descricao": "linha 1\nlinha 2",
+                "estado": "pendente"}, headers=headers)
+    exported = client.get(
+        "/api/tasks/export?formato=csv&estado=pendente", headers=headers).content
+    exported_count = len(list(csv.DictReader(io.StringIO(exported.decode()))))
+
+    import_response = client.post(
+        "/api/tasks/import?formato=csv", content=exported, headers=headers)
+
+    assert import_response.status_code == 200
+    assert import_response.json() == {
+        "aceitas": exported_count, "rejeitadas": 0, "erros": []}
+
+
+def test_import_tasks_from_csv_with_utf8_bom():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    content = "titulo,descricao,estado\r\nPlanilha do Excel,,pendente\r\n".encode("utf-8-sig")
+    import_response = client.post(
+        "/api/tasks/import?formato=csv", content=content, headers=headers)
+
+    assert import_response.json() == {
+        "aceitas": 1, "rejeitadas": 0, "erros": []}
+
+    async def read_lines(chunks):
+        async def stream():
+            for chunk in chunks:
+                yield chunk
+        return [line async for line in iter_lines(stream())]
+
+    # O BOM pode chegar dividido entre os pedaços do corpo.
+    assert asyncio.run(read_lines([content[:1], content[1:2], content[2:]]))[0] == "titulo,descricao,estado"
+
+
+def test_sqlite_connections_use_configured_pragmas():
+    with engine.connect() as connection:
+        journal_mode = connection.exec_driver_sql(
+            "PRAGMA journal_mode").scalar()
+        synchronous = connection.exec_driver_sql("PRAGMA synchronous").scalar()
+        busy_timeout = connection.exec_driver_sql(
+            "PRAGMA busy_timeout").scalar()
+
+    assert journal_mode == "wal"
+    assert synchronous == 1
+    assert busy_timeout == 5000
+
+
+def test_reads_use_replica_until_the_client_writes(monkeypatch, tmp_path):
+    replica_url = f"sqlite:///{tmp_path / 'replica.db'}"
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    owner_id = int(decode_user(response_json["access_token"])["sub"])
+    replica_engine = create_database_engine(replica_url)
+    create_db_and_tables(replica_engine)
+    with Session(replica_engine) as session:
+        session.add(Task(titulo="Tarefa da replica",
+                    estado="pendente", owner_id=owner_id))
+        session.commit()
+
+    monkeypatch.setattr(database, "replica_engines", [replica_engine])
+    monkeypatch.setattr(database, "get_async_replica_engines", lambda: [
+                        create_async_database_engine(replica_url)])
+    monkeypatch.setattr(database, "DATABASE_REPLICA_URLS", ["replica"])
+    database.recent_writers.clear()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    replica_response = client.get("/api/tasks/1", headers=headers)
+    client.post("/api/tasks", json=fake_test_tasks[0], headers=headers)
+    primary_response = client.get("/api/tasks/1", headers=headers)
+    replica_engine.dispose()
+
+    assert replica_response.status_code == 200
+    assert replica_response.json()["titulo"] == "Tarefa da replica"
+    assert primary_response.status_code == 404
+
+
+def test_list_cache_skips_replica_reads_right_after_a_write():
+    list_cache = TaskListCache(maxsize=10, ttl=60)
+    list_cache.invalidate()
+    generation = list_cache.generation
+
+    assert not list_cache.set((1, None), [], generation, replication_lag=60)
+    assert list_cache.set((1, None), [], generation)
+
+
+def test_pool_metrics_count_overflow_and_timeouts(tmp_path):
+    metrics = PoolMetrics()
+    pool_engine = create_engine(f"sqlite:///{tmp_path / 'pool.db'}", poolclass=instrument_pool_class(QueuePool, metrics),
+                                pool_size=1, max_overflow=1, pool_timeout=0.01)
+    first = pool_engine.connect()
+    second = pool_engine.connect()
+    with pytest.raises(PoolTimeoutError):
+        pool_engine.connect()
+    first.close()
+    second.close()
+    pool_engine.dispose()
+
+    stats = metrics.stats()
+    assert stats["checkouts"] == 2
+    assert stats["eventos_overflow"] == 1
+    assert stats["timeouts"] == 1
+
+
+def test_database_pool_stats():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    response = client.get("/api/database/pool", headers=headers)
+    assert response.status_code == 200
+    stats = response.json()
+    pool_name = "primario_async" if USE_ASYNC_DATABASE else "primario"
+    assert pool_name in stats
+    assert "pool" in stats[pool_name]
+    assert client.get("/api/database/pool").status_code == 401
+
+
+def test_metrics_group_requests_by_route_template():
+    metrics_registry.clear()
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    task_id = client.post(
+        "/api/tasks", json=fake_test_tasks[0], headers=headers).json()["id"]
+    client.get(f"/api/tasks/{task_id}", headers=headers)
+    client.get(f"/api/tasks/{task_id}", headers=headers)
+    client.get("/api/tasks/list/1", headers=headers)
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    body = response.text
+    assert 'http_requests_total{method="GET",route="/api/tasks/{id}",status="200"} 2' in body
+    assert 'http_request_duration_seconds_count{method="GET",route="/api/tasks/list/{pagina}"} 1' in body
+    assert 'db_queries_per_request_count{route="/api/tasks/{id}"} 2' in body
+    queries = [line for line in body.splitlines()
+               if line.startswith('db_queries_total{route="/api/tasks/{id}"}')]
+    assert int(queries[0].split()[-1]) >= 2
+    assert "task_list_cache_hit_ratio" in body
+
+
+def test_profiling_header_returns_server_timing_and_dump(monkeypatch, tmp_path):
+    monkeypatch.setattr(profiling, "PROFILING_ENABLED", True)
+    monkeypatch.setattr(profiling, "PROFILING_DIR", tmp_path)
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    assert "server-timing" not in client.get(
+        "/api/tasks/list/1", headers=headers).headers
+
+    response = client.get("/api/tasks/list/1",
+                          headers={**headers, "X-Profile": "1"})
+    assert response.status_code == 200
+    timings = {entry.split(";")[0]
+               for entry in response.headers["server-timing"].split(", ")}
+    assert {"auth", "endpoint", "serializacao", "total"} <= timings
+    assert (tmp_path / response.headers["x-profile-file"]).exists()
+
+    # O JSON das listagens é gerado dentro do endpoint e também entra na etapa "serializacao".
+    dumps = serialization.orjson.dumps
+
+    def slow_dumps(*args, **kwargs):
+        time.sleep(0.02)
+        return dumps(*args, **kwargs)
+
+    monkeypatch.setattr(serialization.orjson, "dumps", slow_dumps)
+    cache.clear()
+    response = client.get("/api/tasks/list/1",
+                          headers={**headers, "X-Profile": "1"})
+    timings = dict(entry.split(";dur=")
+                   for entry in response.headers["server-timing"].split(", "))
+    assert float(timings["serializacao"]) >= 20
+
+
+def test_slow_queries_are_logged_with_plan(monkeypatch, caplog):
+    monkeypatch.setattr(slow_queries, "SLOW_QUERY_THRESHOLD_MS", 0)
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    with caplog.at_level("WARNING", logger="slow_queries"):
+        client.get("/api/tasks/list/1",
+                   params={"estado": "pendente"}, headers=headers)
+
+    messages = [record.getMessage() for record in caplog.records
+                if record.name == "slow_queries"]
+    list_query = next(
+        message for message in messages if "FROM task" in message and "LIMIT" in message)
+    assert "GET /api/tasks/list/{pagina}" in list_query
+    assert "Plano:" in list_query
+    assert "ix_task_owner_estado_id" in list_query
+
+
+def test_failed_explain_keeps_the_transaction():
+    test_engine = create_engine("sqlite://")
+    with test_engine.connect() as connection:
+        connection.exec_driver_sql("CREATE TABLE item (nome VARCHAR)")
+        connection.commit()
+
+        connection.exec_driver_sql("INSERT INTO item VALUES ('mantido')")
+        plan = slow_queries.explain(
+            connection, "SELECT * FROM item WHERE nome = ?", ())
+        assert plan.startswith("EXPLAIN falhou")
+        assert "item" in slow_queries.explain(
+            connection, "SELECT * FROM item WHERE nome = ?", ("mantido",))
+        connection.commit()
+
+    with test_engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            "SELECT nome FROM item").scalar() == "mantido"
+
+
+def test_task_responses_match_serializer_output():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+    created = client.post("/api/tasks", json=fake_test_tasks[1],
+                          headers=headers).json()
+
+    with Session(engine) as session:
+        task = session.get(Task, created["id"])
+        expected = json.loads(TaskSerializer.model_validate(
+            task).model_dump_json())
+
+    assert created["id"] == expected["id"]
+    assert client.get(
+        f"/api/tasks/{created['id']}", headers=headers).json() == expected
+    cursor_page = client.get(
+        "/api/tasks/list", params={"tamanho": PAGINATION_MAX_PER_PAGE}, headers=headers).json()
+    assert expected in cursor_page["tarefas"]
+    owner_id = int(decode_user(response_json["access_token"])["sub"])
+    assert isinstance(cache.get(
+        ("cursor", None, PAGINATION_MAX_PER_PAGE, TaskFilters(), TASK_FIELDS), owner_id), bytes)
+
+
+def test_list_tasks_projects_requested_fields():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    tasks = client.get("/api/tasks/list/1", params={"fields": "titulo,estado"},
+                       headers=headers).json()
+    assert tasks
+    assert all(set(task) == {"id", "titulo", "estado"} for task in tasks)
+
+    page = client.get("/api/tasks/list", params={"fields": "titulo", "tamanho": 1},
+                      headers=headers).json()
+    assert set(page["tarefas"][0]) == {"id", "titulo"}
+    assert page["proximo_cursor"]
+
+    full_tasks = client.get("/api/tasks/list/1", headers=headers).json()
+    assert set(full_tasks[0]) == set(TASK_FIELDS)
+
+    response = client.get("/api/tasks/list/1",
+                          params={"fields": "titulo,prioridade"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_summary_counts_are_cached_until_a_write():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    owner_id = int(decode_user(response_json["access_token"])["sub"])
+
+    summary = client.get("/api/tasks/summary", headers=headers).json()
+    with Session(engine) as session:
+        total = len(session.exec(select(Task).where(
+            Task.owner_id == owner_id)).all())
+        pending = len(session.exec(select(Task).where(
+            Task.owner_id == owner_id, Task.estado == "pendente")).all())
+    assert summary["total"] == total
+    assert summary["estados"]["pendente"] == pending
+    assert set(summary["estados"]) == {"pendente", "concluída", "em andamento"}
+    assert cache.get(("resumo",), owner_id) is not None
+
+    client.post("/api/tasks", json=fake_test_tasks[0], headers=headers)
+    assert cache.get(("resumo",), owner_id) is None
+    summary = client.get("/api/tasks/summary", headers=headers).json()
+    assert summary["total"] == total + 1
+    assert summary["estados"]["pendente"] == pending + 1
+
+
+def test_migration_adds_owner_and_drops_old_indexes():
+    old_engine = create_engine("sqlite://")
+    with old_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE task (id INTEGER PRIMARY KEY, titulo VARCHAR NOT NULL, descricao VARCHAR, "
+            "estado VARCHAR NOT NULL, data_criacao DATETIME NOT NULL, data_atualizacao DATETIME NOT NULL)")
+        connection.exec_driver_sql(
+            "CREATE INDEX ix_task_estado_id ON task (estado, id)")
+        connection.exec_driver_sql(
+            "CREATE INDEX ix_task_titulo ON task (titulo)")
+    SQLModel.metadata.create_all(old_engine)
+
+    run_migrations(old_engine)
+
+    inspector = inspect(old_engine)
+    assert "owner_id" in {column["name"]
+                          for column in inspector.get_columns("task")}
+    index_names = {index["name"] for index in inspector.get_indexes("task")}
+    assert "ix_task_estado_id" not in index_names
+    assert "ix_task_owner_id_id" in index_names
+    # Indices criados fora dos models são mantidos.
+    assert "ix_task_titulo" in index_names
+
+
+def test_migration_assigns_an_owner_to_existing_tasks(caplog):
+    old_engine = create_engine("sqlite://")
+    with old_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE TABLE task (id INTEGER PRIMARY KEY, titulo VARCHAR NOT NULL, descricao VARCHAR, "
+            "estado VARCHAR NOT NULL, data_criacao DATETIME NOT NULL, data_atualizacao DATETIME NOT NULL)")
+        connection.exec_driver_sql(
+            "INSERT INTO task (titulo, estado, data_criacao, data_atualizacao) "
+            "VALUES ('Antiga', 'pendente', '2024-01-01 00:00:00', '2024-01-01 00:00:00')")
+    SQLModel.metadata.create_all(old_engine)
+
+    with caplog.at_level("WARNING", logger="migrations"):
+        run_migrations(old_engine, owner_id=None)
+    assert "MIGRATION_OWNER_ID" in caplog.text
+
+    run_migrations(old_engine, owner_id=7)
+    with old_engine.connect() as connection:
+        assert connection.exec_driver_sql(
+            "SELECT owner_id FROM task").scalar() == 7
+
+
+def test_tasks_are_scoped_to_their_owner():
+    other_user = {"username": "outro_usuario", "password": "outra_senha"}
+    client.post("/api/user/create", json=other_user)
+    owner_token = client.post(
+        "/api/auth/token", data=fake_user).json()["access_token"]
+    other_token = client.post(
+        "/api/auth/token", data=other_user).json()["access_token"]
+    owner_headers = {"Authorization": f"Bearer {owner_token}"}
+    other_headers = {"Authorization": f"Bearer {other_token}"}
+
+    task_id = client.post("/api/tasks", json=fake_test_tasks[0],
+                          headers=owner_headers).json()["id"]
+    client.get("/api/tasks/list/1", headers=owner_headers)
+
+    assert client.get(f"/api/tasks/{task_id}",
+                      headers=other_headers).status_code == 404
+    assert client.patch(f"/api/tasks/{task_id}", json={"titulo": "Invadida"},
+                        headers=other_headers).status_code == 404
+    assert client.delete(f"/api/tasks/{task_id}",
+                         headers=other_headers).status_code == 404
+    assert client.request("DELETE", "/api/tasks/bulk", json={"ids": [task_id]},
+                          headers=other_headers).json()["ids"] == []
+    assert task_id not in [task["id"] for task in client.get(
+        "/api/tasks/list", params={"tamanho": PAGINATION_MAX_PER_PAGE}, headers=other_headers).json()["tarefas"]]
+
+    # Escritas de outro usuário não descartam o cache das listagens do dono.
+    client.post("/api/tasks", json=fake_test_tasks[0], headers=other_headers)
+    owner_id = int(decode_user(owner_token)["sub"])
+    assert cache.get((1, PAGINATION_PER_PAGE, TaskFilters(), TASK_FIELDS),
+                     owner_id) is not None
+    assert client.get(f"/api/tasks/{task_id}",
+                      headers=owner_headers).json()["titulo"] == fake_test_tasks[0]["titulo"]
+
+
+def test_token_carries_only_the_user_id():
+    token = client.post("/api/auth/token",
+                        data=fake_user).json()["access_token"]
+    claims = decode_user(token)
+
+    assert set(claims) == {"sub", "exp"}
+    assert "password" not in claims
+
+
+def test_current_user_is_resolved_from_cache():
+    token = client.post("/api/auth/token",
+                        data=fake_user).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    user_id = int(decode_user(token)["sub"])
+    user_cache.clear()
+
+    assert client.get("/api/tasks/summary", headers=headers).status_code == 200
+    assert user_cache.stats() == {"hits": 0, "misses": 1, "size": 1}
+    assert client.get("/api/tasks/summary", headers=headers).status_code == 200
+    assert user_cache.stats()["hits"] == 1
+    assert user_cache.get(user_id).username == fake_user["username"]
+
+    user_cache.invalidate(user_id)
+    assert user_cache.get(user_id) is None
+
+
+def test_token_of_missing_user_is_rejected():
+    token = encode_user({"sub": "999999"})
+    response = client.get("/api/tasks/summary",
+                          headers={"Authorization": f"Bearer {token}"})
+
+    assert response.status_code == 401
+
+
+def test_search_tasks_ranks_and_follows_writes():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    in_description = client.post("/api/tasks", json={"titulo": "Compras", "descricao": "passar no supermercadinho",
+                                                     "estado": "pendente"}, headers=headers).json()["id"]
+    in_title = client.post("/api/tasks", json={"titulo": "Supermercadinho do bairro", "descricao": "ovos",
+                                               "estado": "pendente"}, headers=headers).json()["id"]
+
+    response = client.get("/api/tasks/search",
+                          params={"termo": "SUPERMERCADINHO"}, headers=headers)
+    assert response.status_code == 200
+    ids = [task["id"] for task in response.json()]
+    assert ids[:2] == [in_title, in_description]
+
+    # Busca por prefixo, sem acentos, e projeção dos campos.
+    response = client.get("/api/tasks/search", params={
+                          "termo": "supermerc bairro", "fields": "titulo"}, headers=headers)
+    assert response.json() == [
+        {"id": in_title, "titulo": "Supermercadinho do bairro"}]
+
+    client.patch(f"/api/tasks/{in_title}",
+                 json={"titulo": "Padaria"}, headers=headers)
+    client.delete(f"/api/tasks/{in_description}", headers=headers)
+    response = client.get("/api/tasks/search",
+                          params={"termo": "supermercadinho"}, headers=headers)
+    assert response.json() == []
+
+    other_user = {"username": "usuario_busca", "password": "senha_busca"}
+    client.post("/api/user/create", json=other_user)
+    other_token = client.post(
+        "/api/auth/token", data=other_user).json()["access_token"]
+    response = client.get("/api/tasks/search", params={"termo": "padaria"},
+                          headers={"Authorization": f"Bearer {other_token}"})
+    assert response.json() == []
+
+    response = client.get("/api/tasks/search",
+                          params={"termo": "\"*"}, headers=headers)
+    assert response.status_code == 400
+
+
+def test_search_ranks_only_the_owner_latest_candidates(monkeypatch):
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+    other_user = {"username": "usuario_frequente", "password": "senha_frequente"}
+    client.post("/api/user/create", json=other_user)
+    other_token = client.post(
+        "/api/auth/token", data=other_user).json()["access_token"]
+    other_headers = {"Authorization": f"Bearer {other_token}"}
+
+    # Um termo frequente em muitas tarefas de outro usuário não entra nas tarefas do dono.
+    for number in range(5):
+        client.post("/api/tasks", json={"titulo": f"Lembrete frequente {number}",
+                    "estado": "pendente"}, headers=other_headers)
+    own_ids = [client.post("/api/tasks", json={"titulo": f"Lembrete {number}", "descricao": "frequente",
+                                               "estado": "pendente"}, headers=headers).json()["id"]
+               for number in range(3)]
+    in_title = client.post("/api/tasks", json={"titulo": "Frequente no titulo",
+                           "estado": "pendente"}, headers=headers).json()["id"]
+
+    response = client.get("/api/tasks/search",
+                          params={"termo": "frequente"}, headers=headers)
+    ids = [task["id"] for task in response.json()]
+    assert ids[0] == in_title
+    assert sorted(ids) == sorted(own_ids + [in_title])
+
+    # Somente as tarefas mais recentes que combinam com o termo são ordenadas pela relevancia.
+    monkeypatch.setattr(search, "SEARCH_MAX_CANDIDATES", 2)
+    response = client.get("/api/tasks/search",
+                          params={"termo": "frequente", "tamanho": 5}, headers=headers)
+    ids = [task["id"] for task in response.json()]
+    assert ids == [in_title, own_ids[-1]]
+
+
+def test_search_index_is_rebuilt_with_the_owner():
+    old_engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(old_engine)
+    with Session(old_engine) as session:
+        session.add(Task(titulo="Consulta medica",
+                    descricao=None, estado="pendente", owner_id=7))
+        session.commit()
+    with old_engine.begin() as connection:
+        connection.exec_driver_sql(
+            "CREATE VIRTUAL TABLE task_fts USING fts5(titulo, descricao, content='task', content_rowid='id')")
+        connection.exec_driver_sql(
+            "INSERT INTO task_fts(task_fts) VALUES('rebuild')")
+        create_search_index(connection)
+
+    with old_engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT rowid FROM task_fts WHERE task_fts MATCH 'owner_id:\"7\" AND medica'").all()
+    assert len(rows) == 1
+
+
+def test_search_index_waits_for_the_task_table():
+    empty_engine = create_engine("sqlite://")
+    with empty_engine.begin() as connection:
+        create_search_index(connection)
+    assert not inspect(empty_engine).has_table("task_fts")
+
+
+def test_migration_indexes_existing_tasks_for_search():
+    old_engine = create_engine("sqlite://")
+    SQLModel.metadata.create_all(old_engine)
+    with Session(old_engine) as session:
+        session.add(Task(titulo="Consulta medica",
+                    descricao=None, estado="pendente", owner_id=1))
+        session.commit()
+
+    run_migrations(old_engine)
+    run_migrations(old_engine)
+
+    with old_engine.connect() as connection:
+        rows = connection.exec_driver_sql(
+            "SELECT rowid FROM task_fts WHERE task_fts MATCH 'medica'").all()
+    assert len(rows) == 1
+
+
+def test_list_filters_map_to_stored_states():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    client.post("/api/tasks", json=fake_test_tasks[1], headers=headers)
+    client.post("/api/tasks", json={"titulo": "Em andamento",
+                "estado": "em andamento"}, headers=headers)
+
+    tasks = client.get("/api/tasks/list", params={"estado": "concluida", "tamanho": PAGINATION_MAX_PER_PAGE},
+                       headers=headers).json()["tarefas"]
+    assert tasks and {task["estado"] for task in tasks} == {"concluída"}
+
+    tasks = client.get("/api/tasks/list", params={"estado": "concluida,andamento", "tamanho": PAGINATION_MAX_PER_PAGE},
+                       headers=headers).json()["tarefas"]
+    assert {task["estado"] for task in tasks} == {"concluída", "em andamento"}
+
+    response = client.get("/api/tasks/list/1", params={"estado": "pendente,pendentee"},
+                          headers=headers)
+    assert response.status_code == 400
+
+
+def test_list_tasks_sorted_by_date_with_cursor():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    created = [client.post("/api/tasks", json={"titulo": f"Ordenada {index}", "estado": "pendente"},
+                           headers=headers).json() for index in range(3)]
+    params = {"ordenar": "-data_criacao", "criada_apos": created[0]["data_criacao"],
+              "tamanho": 2, "fields": "titulo"}
+
+    first_page = client.get("/api/tasks/list", params=params,
+                            headers=headers).json()
+    assert [task["id"] for task in first_page["tarefas"]] == [
+        created[2]["id"], created[1]["id"]]
+    assert set(first_page["tarefas"][0]) == {"id", "titulo"}
+
+    second_page = client.get("/api/tasks/list", params={**params, "cursor": first_page["proximo_cursor"]},
+                             headers=headers).json()
+    assert [task["id"] for task in second_page["tarefas"]] == [
+        created[0]["id"]]
+    assert second_page["proximo_cursor"] is None
+
+    # O cursor pertence a uma ordenação, não pode ser usado em outra.
+    response = client.get("/api/tasks/list", params={"ordenar": "data_criacao", "cursor": first_page["proximo_cursor"]},
+                          headers=headers)
+    assert response.status_code == 400
+
+    page = client.get("/api/tasks/list/1", params={**params, "fields": None},
+                      headers=headers).json()
+    assert [task["id"] for task in page] == [
+        created[2]["id"], created[1]["id"]]
+
+    assert client.get("/api/tasks/list/1", params={"ordenar": "titulo"},
+                      headers=headers).status_code == 400
+    assert client.get("/api/tasks/list/1", params={"criada_apos": created[2]["data_criacao"], "criada_antes": created[0]["data_criacao"]},
+                      headers=headers).status_code == 400
+
+
+def test_unindexed_filter_combinations_are_limited(monkeypatch):
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+    params = {"estado": "pendente", "ordenar": "-data_atualizacao"}
+
+    assert client.get("/api/tasks/list", params=params,
+                      headers=headers).status_code == 200
+
+    cache.clear()
+    monkeypatch.setattr(crud, "LIST_FILTER_SCAN_MAX_TASKS", 1)
+    assert client.get("/api/tasks/list", params=params,
+                      headers=headers).status_code == 400
+    assert client.get("/api/tasks/list/1", params=params,
+                      headers=headers).status_code == 400
+    assert client.get("/api/tasks/list", params={"estado": "pendente"},
+                      headers=headers).status_code == 200
+
+
+@pytest.mark.parametrize("filters", [
+    TaskFilters(),
+    TaskFilters(ordenar="-id"),
+    TaskFilters(estados=(PossiveisEstados.concluido,)),
+    TaskFilters(criada_apos=datetime(2024, 1, 1), ordenar="data_criacao"),
+    TaskFilters(atualizada_antes=datetime(2024, 1, 1),
+                ordenar="-data_atualizacao"),
+])
+def test_indexed_filters_use_the_planned_index(filters):
+    query = get_filtered_task_query(1, filters).order_by(
+        *filters.get_order_by()).limit(10)
+    statement = str(query.compile(
+        engine, compile_kwargs={"literal_binds": True}))
+
+    with engine.connect() as connection:
+        plan = [row[-1] for row in connection.exec_driver_sql(
+            f"EXPLAIN QUERY PLAN {statement}").all()]
+
+    assert any(filters.get_index() in detail for detail in plan)
+    assert not any("TEMP B-TREE" in detail for detail in plan)
+
+
+def test_read_task_answers_conditional_requests():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    task_id = client.post("/api/tasks", json=fake_test_tasks[0],
+                          headers=headers).json()["id"]
+    response = client.get(f"/api/tasks/{task_id}", headers=headers)
+    etag = response.headers["etag"]
+    last_modified = response.headers["last-modified"]
+    assert etag.startswith('"') and last_modified.endswith("GMT")
+    assert response.headers["cache-control"] == "private, no-cache"
+
+    response = client.get(f"/api/tasks/{task_id}",
+                          headers={**headers, "If-None-Match": f'"outro", W/{etag}'})
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+
+    response = client.get(f"/api/tasks/{task_id}",
+                          headers={**headers, "If-Modified-Since": last_modified})
+    assert response.status_code == 304
+
+    client.patch(f"/api/tasks/{task_id}",
+                 json={"titulo": "Alterada"}, headers=headers)
+    response = client.get(f"/api/tasks/{task_id}",
+                          headers={**headers, "If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["etag"] != etag
+    assert response.json()["titulo"] == "Alterada"
+
+
+def test_list_tasks_answer_conditional_requests():
+    response = client.post("/api/auth/token", data=fake_user)
+    response_json = response.json()
+    headers = {"Authorization": f"Bearer {response_json["access_token"]}"}
+
+    # Ordenadas da mais nova, assim a tarefa criada muda a primeira pagina.
+    for url, params in (("/api/tasks/list", {"ordenar": "-id"}), ("/api/tasks/list/1", {"ordenar": "-id"}),
+                        ("/api/tasks/summary", None)):
+        response = client.get(url, params=params, headers=headers)
+        etag = response.headers["etag"]
+
+        # A primeira requisição guardou o corpo no cache, a segunda responde 304 a partir dele.
+        not_modified = client.get(
+            url, params=params, headers={**headers, "If-None-Match": etag})
+        assert not_modified.status_code == 304
+        assert not_modified.content == b""
+
+        client.post("/api/tasks", json=fake_test_tasks[0], headers=headers)
+        response = client.get(
+            url, params=params, headers={**headers, "If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+
+
+def test_seed_tasks_uses_a_single_writer_on_sqlite(tmp_path, caplog):
+    database_url = f"sqlite:///{tmp_path / 'seed.db'}"
+    with caplog.at_level("WARNING", logger="generate_tasks"):
+        inserted, _ = seed_tasks(
+            database_url, amount=40, batch_size=10, workers=4, owner_id=1)
+
+    assert inserted == 40
+    assert "1 processo" in caplog.text
@@ -1,17 +1,18 @@
 
 from pydantic import BaseModel, ConfigDict
-from typing import Annotated
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+import binascii
+import json
 from datetime import datetime, timezone
 from settings import JWT_EXPIRATION_TIME, PAGINATION_PER_PAGE, JWT_SECRET_KEY, JWT_HASH_ALGORITHM
-from fastapi import Depends, HTTPException
-from database import SessionDep, oauth_scheme
-from passlib.context import CryptContext
+from fastapi import HTTPException
+from database import SessionDep
+from cache import token_cache
+from sqlalchemy import tuple_
 from sqlmodel.sql._expression_select_cls import SelectOfScalar
 from jwt import encode, decode, ExpiredSignatureError, InvalidTokenError
 from zoneinfo import ZoneInfo
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
-
 
 class BaseModelSerializer(BaseModel):
     model_config = ConfigDict(from_attributes=True)
@@ -21,12 +22,42 @@ def get_utc_now():
     return datetime.now(ZoneInfo("America/Sao_Paulo"))
 
 
-def get_paginated_tasks(page: int, select_query: SelectOfScalar):
+def get_paginated_tasks(page: int, select_query: SelectOfScalar, per_page: int = PAGINATION_PER_PAGE):
     if not isinstance(page, int) or page < 1:
         page = 1
 
-    initial = page * PAGINATION_PER_PAGE - PAGINATION_PER_PAGE
-    return select_query.offset(initial).limit(PAGINATION_PER_PAGE)
+    initial = page * per_page - per_page
+    return select_query.offset(initial).limit(per_page)
+
+
+def get_keyset_paginated_tasks(select_query: SelectOfScalar, key_columns: tuple, last_key: tuple | None, per_page: int = PAGINATION_PER_PAGE, descending: bool = False):
+    # Busca um item a mais para saber se existe uma proxima pagina sem outra consulta. A chave
+    # termina sempre no id, então é unica e a comparação segue a ordem do indice.
+    if last_key is not None:
+        key = key_columns[0] if len(key_columns) == 1 else tuple_(*key_columns)
+        last = last_key[0] if len(last_key) == 1 else last_key
+        select_query = select_query.where(
+            key < last if descending else key > last)
+
+    order = [column.desc() if descending else column for column in key_columns]
+    return select_query.order_by(*order).limit(per_page + 1)
+
+
+def encode_cursor(values: dict):
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str):
+    try:
+        padding = "=" * (-len(cursor) % 4)
+        values = json.loads(urlsafe_b64decode(cursor + padding))
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Cursor invalido.")
+
+    if not isinstance(values, dict):
+        raise HTTPException(status_code=400, detail="Cursor invalido.")
+    return values
 
 
 def get_task_or_404(session: SessionDep, task, id: int):
@@ -45,10 +76,13 @@ def encode_user(payload: dict[str]):
 
 
 def decode_user(token: str):
+    claims = token_cache.get(token)
+    if claims is not None:
+        return claims
 
     try:
-        return decode(token, key=JWT_SECRET_KEY,
-                      algorithms=(JWT_HASH_ALGORITHM))
+        claims = decode(token, key=JWT_SECRET_KEY,
+                        algorithms=(JWT_HASH_ALGORITHM))
     except ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expirado.")
     except InvalidTokenError:
@@ -56,14 +90,6 @@ def decode_user(token: str):
     except Exception:
         raise HTTPException(status_code=401, detail="Acesso negado!")
 
+    token_cache.set(token, claims)
+    return claims
 
-def get_current_user(token: Annotated[str, Depends(oauth_scheme)]):
-    return decode_user(token)
-
-
-def generate_hashed_pwd(password: str):
-    return pwd_context.hash(password)
-
-
-def check_hashed_pwd(plain: str, hashed: str):
-    return pwd_context.verify(plain, hashed)